@@ -0,0 +1,286 @@
+"""In-memory stand-ins for the parts of discord.py the bot touches.
+
+Every REST call a real guild would make goes through FakeDiscord.call(),
+which counts it by route, applies a fixed latency and enforces a simple
+per-bucket rate limit, so scenarios can compare API-call counts and wall
+time without a connection to Discord.
+"""
+import asyncio
+import itertools
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+_ids = itertools.count(10 ** 17)
+
+def snowflake() -> int:
+    return next(_ids)
+
+class FakeDiscord:
+    """Counts REST calls and simulates latency and per-bucket rate limits."""
+
+    def __init__(self, latency: float = 0.005, bucket_limit: int = 5, bucket_window: float = 0.1):
+        self.latency = latency
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.calls = Counter()
+        self.rate_limited = 0
+        self._buckets = defaultdict(deque)   # bucket -> recent call times
+
+    async def call(self, route: str, bucket):
+        self.calls[route] += 1
+        recent = self._buckets[bucket]
+        while True:
+            now = time.monotonic()
+            while recent and now - recent[0] >= self.bucket_window:
+                recent.popleft()
+            if len(recent) < self.bucket_limit:
+                break
+            self.rate_limited += 1
+            await asyncio.sleep(self.bucket_window - (now - recent[0]))
+        recent.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+
+    def reset(self):
+        self.calls.clear()
+        self.rate_limited = 0
+        self._buckets.clear()
+
+    @property
+    def total(self) -> int:
+        return sum(self.calls.values())
+
+class FakeHTTP:
+    def __init__(self, api: FakeDiscord, guild):
+        self.api = api
+        self.guild = guild
+
+    async def bulk_channel_update(self, guild_id, data, reason=None):
+        await self.api.call("PATCH /guilds/{id}/channels", ("guild", guild_id))
+        for entry in data:
+            self.guild.get_channel(entry["id"]).position = entry["position"]
+
+class FakeState:
+    def __init__(self, api: FakeDiscord, guild):
+        self.http = FakeHTTP(api, guild)
+
+class FakeRole:
+    def __init__(self, name: str):
+        self.id = snowflake()
+        self.name = name
+
+class FakeMember:
+    def __init__(self, name: str = "admin", admin: bool = True):
+        self.id = snowflake()
+        self.name = name
+        self.mention = f"<@{self.id}>"
+        self.guild_permissions = discord.Permissions(manage_guild=admin)
+        self.roles = []
+
+    def __str__(self):
+        return self.name
+
+PLAYER = FakeMember("player", admin=False)
+
+class FakeGuild:
+    def __init__(self, api: FakeDiscord):
+        self.id = snowflake()
+        self.api = api
+        self._state = FakeState(api, self)
+        self._channels = {}
+        self.filesize_limit = 25 * 1024 * 1024
+        self.default_role = FakeRole("@everyone")
+        self.roles = [self.default_role, FakeRole("Admin")]
+        self.me = FakeMember("bot")
+
+    def get_channel(self, channel_id):
+        return self._channels.get(channel_id)
+
+    @property
+    def categories(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeCategory)]
+
+    @property
+    def text_channels(self):
+        return [c for c in self._channels.values() if isinstance(c, FakeTextChannel)]
+
+    def add_category(self, name: str) -> "FakeCategory":
+        category = FakeCategory(self, name)
+        self._channels[category.id] = category
+        return category
+
+class FakeCategory(discord.CategoryChannel):
+    def __init__(self, guild: FakeGuild, name: str):
+        self.id = snowflake()
+        self.name = name
+        self.guild = guild
+        self.position = 0
+        self.category_id = None
+        self._children = []
+        self._perms = {}
+
+    @property
+    def overwrites(self):
+        return dict(self._perms)
+
+    @property
+    def channels(self):
+        return sorted(self._children, key=lambda c: (c.position, c.id))
+
+    @property
+    def text_channels(self):
+        return self.channels
+
+    def add_channel(self, name: str, position: int = None) -> "FakeTextChannel":
+        """Put a channel in the category without counting an API call (scenario setup)."""
+        channel = FakeTextChannel(self, name, len(self._children) if position is None else position)
+        self._children.append(channel)
+        self.guild._channels[channel.id] = channel
+        return channel
+
+    async def create_text_channel(self, name: str, position: int = None, **kwargs):
+        await self.guild.api.call("POST /guilds/{id}/channels", ("guild", self.guild.id))
+        return self.add_channel(name, position)
+
+    async def edit(self, **fields):
+        await self.guild.api.call("PATCH /channels/{id}", ("channel", self.id))
+        if "overwrites" in fields:
+            self._perms = dict(fields["overwrites"])
+
+    async def delete(self, reason=None):
+        await self.guild.api.call("DELETE /channels/{id}", ("channel", self.id))
+        self.guild._channels.pop(self.id, None)
+
+class FakeMessage:
+    def __init__(self, channel, content: str = "", author: FakeMember = PLAYER, attachments=(), created_at=None):
+        self.id = snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.author = author
+        self.attachments = list(attachments)
+        self.embeds = []
+        self.created_at = created_at or datetime.now(timezone.utc)
+
+    async def edit(self, **fields):
+        await self.channel.guild.api.call("PATCH /webhooks/{id}/messages", ("webhook", self.channel.id))
+
+class FakeAttachment:
+    def __init__(self, url: str, filename: str, size: int, content_type: str = None):
+        self.id = snowflake()
+        self.url = url
+        self.filename = filename
+        self.size = size
+        self.content_type = content_type
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, category: FakeCategory, name: str, position: int):
+        self.id = snowflake()
+        self.name = name
+        self.position = position
+        self.guild = category.guild
+        self.category_id = category.id
+        self._category = category
+        self._perms = {}
+        self.messages = []
+
+    @property
+    def overwrites(self):
+        return dict(self._perms)
+
+    @property
+    def category(self):
+        return self._category if self.id in self.guild._channels else None
+
+    def permissions_for(self, member):
+        return discord.Permissions.text()
+
+    def fill_history(self, count: int, attachment_every: int = 0, cdn_url: str = None, attachment_size: int = 2048):
+        """Add `count` messages (no API calls), every Nth one with an attachment served by the stub CDN."""
+        start = datetime.now(timezone.utc) - timedelta(minutes=count)
+        for i in range(count):
+            attachments = []
+            if attachment_every and i % attachment_every == 0:
+                text = (i // attachment_every) % 2
+                filename = f"note{i}.txt" if text else f"shot{i}.png"
+                content_type = None if text else "image/png"
+                attachments.append(FakeAttachment(f"{cdn_url}/{attachment_size}/{filename}", filename, attachment_size, content_type))
+            self.messages.append(FakeMessage(self, f"message {i}", attachments=attachments, created_at=start + timedelta(minutes=i)))
+
+    async def history(self, limit=None, after=None, oldest_first=True):
+        messages = self.messages if oldest_first else self.messages[::-1]
+        if after is not None:
+            after_id = getattr(after, "id", after)
+            messages = [m for m in messages if m.id > after_id]
+        if limit is not None:
+            messages = messages[:limit]
+        for start in range(0, len(messages), 100):
+            await self.guild.api.call("GET /channels/{id}/messages", ("messages", self.id))
+            for message in messages[start:start + 100]:
+                yield message
+
+    async def edit(self, **fields):
+        await self.guild.api.call("PATCH /channels/{id}", ("channel", self.id))
+        if "overwrites" in fields:
+            self._perms = dict(fields["overwrites"])
+
+    async def delete(self, reason=None):
+        await self.guild.api.call("DELETE /channels/{id}", ("channel", self.id))
+        self._category._children.remove(self)
+        self.guild._channels.pop(self.id, None)
+
+    async def send(self, content=None, **kwargs):
+        for file in kwargs.get("files") or ():
+            file.close()
+        await self.guild.api.call("POST /channels/{id}/messages", ("messages", self.id))
+        message = FakeMessage(self, content or "")
+        self.messages.append(message)
+        return message
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self) -> bool:
+        return self._done
+
+    async def _respond(self):
+        self._done = True
+        await self.interaction.guild.api.call("POST /interactions/{id}/callback", ("interaction", self.interaction.id))
+
+    async def defer(self, **kwargs):
+        await self._respond()
+
+    async def send_message(self, content=None, **kwargs):
+        self.interaction.sent.append(content)
+        await self._respond()
+
+    async def send_modal(self, modal):
+        await self._respond()
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.sent.append(content)
+        if kwargs.get("file"):
+            kwargs["file"].close()
+        await self.interaction.guild.api.call("POST /webhooks/{id}", ("webhook", self.interaction.id))
+        return FakeMessage(self.interaction.channel, content or "")
+
+class FakeInteraction:
+    def __init__(self, channel: FakeTextChannel, user: FakeMember = None):
+        self.id = snowflake()
+        self.channel = channel
+        self.guild = channel.guild
+        self.guild_id = channel.guild.id
+        self.user = user or FakeMember()
+        self.command = None
+        self.created_at = datetime.now(timezone.utc)
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.sent = []
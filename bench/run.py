@@ -0,0 +1,308 @@
+"""Offline benchmarks for the bot's hot paths.
+
+Runs each scenario against the fake guild in bench/fakes.py and the local
+stub server in bench/stubs.py, and writes the wall time, Discord API calls
+(by route), simulated rate-limit waits and stub HTTP requests as JSON:
+
+    python bench/run.py --sizes 10,100,1000 --out bench-results.json
+
+Compare two result files to spot regressions in API-call count or time.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.environ.setdefault("SEARCH_ENABLED", "1")  # the search scenario needs the FTS schema
+
+import discord  # noqa: E402
+
+import bot  # noqa: E402
+from fakes import FakeDiscord, FakeGuild, FakeInteraction, FakeMember  # noqa: E402
+from stubs import CATEGORIES, StubServer  # noqa: E402
+
+DEFAULT_SIZES = [10, 100, 1000]
+
+class Bench:
+    def __init__(self, api: FakeDiscord, stub: StubServer):
+        self.api = api
+        self.stub = stub
+
+    def category(self, name: str = "--- BenchCTF ---"):
+        guild = FakeGuild(self.api)
+        category = guild.add_category(name)
+        category.add_channel("data")
+        category.add_channel("chat")
+        return category
+
+    def challenge_category(self, size: int, solved_ratio: float = 0.0, seed: int = 1):
+        """Category with `size` challenge channels in random order, some already solved."""
+        rng = random.Random(seed)
+        category = self.category()
+        names = []
+        for i in range(size):
+            name = f"{rng.choice(CATEGORIES)}-challenge-{i}"
+            if rng.random() < solved_ratio:
+                name = f"{rng.choice(bot.SOLVED_PREFIXES)}{name}"
+            names.append(name)
+        rng.shuffle(names)
+        for name in names:
+            category.add_channel(name)
+        return category
+
+async def reset_bot_state():
+    bot.channel_writes = bot.ChannelWriteQueue()
+    bot.ctftime_cache = bot.CTFTimeCache()
+    bot.challenge_index = bot.ChallengeIndex()
+    bot.leaderboards.clear()
+    await bot.reset_ctfd_clients()
+    bot.user_ctfd_data.clear()
+    bot.ctfd_links.clear()
+    bot.ctf_events.clear()
+
+# -------------------- Scenarios --------------------
+async def scenario_reorder(bench: Bench, size: int) -> dict:
+    category = bench.challenge_category(size, solved_ratio=0.3)
+    first = await bot.reorder_challenges(category)
+    second = await bot.reorder_challenges(category)
+    return {"reorder_calls": first, "repeat_calls": second}
+
+async def run_sync(bench: Bench, size: int, mirror: bool) -> dict:
+    bench.stub.challenges = size
+    category = bench.category()
+    interaction = FakeInteraction(category.channels[0])
+    modal = bot.SyncChallengesModal(mirror=mirror)
+    modal.ctfd_url._value = bench.stub.url
+    modal.token._value = "ctfd_bench"
+    await modal.on_submit(interaction)
+    return {"channels_created": len(category.channels) - 2}
+
+async def scenario_sync(bench: Bench, size: int) -> dict:
+    return await run_sync(bench, size, mirror=False)
+
+async def scenario_sync_mirror(bench: Bench, size: int) -> dict:
+    return await run_sync(bench, size, mirror=True)
+
+async def scenario_solve(bench: Bench, size: int) -> dict:
+    """Every challenge in the category gets /solve at once, as at the end of a busy CTF."""
+    category = bench.challenge_category(size)
+    channels = category.channels[2:]
+    players = [FakeMember(f"player{i}") for i in range(8)]
+
+    async def solve(i, channel):
+        interaction = FakeInteraction(channel, players[i % len(players)])
+        await bot.solve.callback(interaction, players[i % len(players)].mention, "yes" if i % 5 == 0 else "no")
+        return interaction.sent[-1]
+
+    replies = await asyncio.gather(*(solve(i, ch) for i, ch in enumerate(channels)))
+    in_order = [c.name for c in category.channels] == [c.name for c in bot.challenge_order(category.channels)]
+    return {"solved": sum(r.startswith("✅") for r in replies), "ordered": in_order}
+
+async def scenario_private(bench: Bench, size: int) -> dict:
+    """/private on a category where every other channel is already private, then /public."""
+    category = bench.challenge_category(size)
+    guild = category.guild
+    private = {
+        guild.default_role: discord.PermissionOverwrite(view_channel=False),
+        guild.roles[1]: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+        guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+    }
+    for ch in category.channels[::2]:
+        ch._perms = dict(private)
+    await bot.private.callback(FakeInteraction(category.channels[0]))
+    all_private = all(ch.overwrites == private for ch in category.channels)
+    await bot.public.callback(FakeInteraction(category.channels[0]))
+    return {"private": all_private, "public": all(guild.default_role not in ch.overwrites for ch in category.channels)}
+
+async def scenario_export(bench: Bench, size: int) -> dict:
+    """`size` messages spread over 5 channels, every 10th with an attachment."""
+    category = bench.category()
+    channels = [category.add_channel(f"web-export-{i}") for i in range(5)]
+    for ch in channels:
+        ch.fill_history(size // len(channels), attachment_every=10, cdn_url=f"{bench.stub.url}/cdn")
+    interaction = FakeInteraction(channels[0])
+    await bot.export_category.callback(interaction, mode="full")
+    return {"messages": sum(len(ch.messages) for ch in channels)}
+
+async def scenario_leaderboard(bench: Bench, size: int) -> dict:
+    """Index `size` solves, then serve 100 leaderboard views (global, per CTF and per user)."""
+    rng = random.Random(size)
+    users = [FakeMember(f"player{i}") for i in range(max(2, size // 5))]
+    channel = bench.category().channels[0]
+    for i in range(size):
+        bot.leaderboards[channel.guild.id].add_solve({
+            "guild_id": channel.guild.id,
+            "ctf": f"CTF {i % 4}",
+            "channel": f"{rng.choice(CATEGORIES)}-challenge-{i}",
+            "users": [u.mention for u in rng.sample(users, 2)],
+            "blooded": rng.random() < 0.1,
+        })
+    for i in range(100):
+        interaction = FakeInteraction(channel)
+        if i % 3 == 0:
+            await bot.leaderboard.callback(interaction)
+        elif i % 3 == 1:
+            await bot.leaderboard.callback(interaction, ctf=f"CTF {i % 4}")
+        else:
+            await bot.leaderboard.callback(interaction, user=rng.choice(users))
+    return {"views": 100}
+
+async def scenario_ctftime(bench: Bench, size: int) -> dict:
+    """`size` concurrent callers asking for upcoming events right after startup."""
+    results = await asyncio.gather(*(bot.ctftime_cache.get_events(5) for _ in range(size)))
+    return {"callers_served": sum(r is not None for r in results)}
+
+SEARCH_WORDS = ["libc", "offset", "leak", "heap", "tcache", "jwt", "token", "admin", "flag", "payload",
+                "gadget", "rop", "canary", "cookie", "xss", "sqli", "padding", "oracle", "nonce", "key"]
+
+async def scenario_search(bench: Bench, size: int) -> dict:
+    """Backfill `size` × 100 messages over 10 channels into the search index, then run 100 searches.
+
+    Common-word searches are the worst case: every match has to be ranked.
+    """
+    rng = random.Random(size)
+    category = bench.category()
+    channels = [category.add_channel(f"pwn-search-{i}") for i in range(10)]
+    for ch in channels:
+        ch.fill_history(size * 10)
+        for msg in ch.messages:
+            msg.content = " ".join(rng.choices(SEARCH_WORDS, k=12)) + f" 0x{rng.getrandbits(32):08x}"
+    await bot.backfill_search_index([category.guild])
+    await bot.state_store.flush()
+
+    async def timed(query: str, **filters) -> float:
+        interaction = FakeInteraction(channels[0])
+        started = time.perf_counter()
+        await bot.search.callback(interaction, query, **filters)
+        assert interaction.sent[-1].startswith("🔎"), interaction.sent[-1]
+        return (time.perf_counter() - started) * 1000
+
+    # common: two words found in a large share of all messages; rare: part of one pasted hex value
+    common, rare = [], []
+    for i in range(50):
+        filters = {"channel": channels[i % len(channels)]} if i % 2 else {}
+        common.append(await timed(" ".join(rng.sample(SEARCH_WORDS, 2)), **filters))
+        needle = rng.choice(rng.choice(channels).messages).content.rsplit(" ", 1)[1]
+        rare.append(await timed(needle[2:8], **filters))
+    common.sort()
+    rare.sort()
+    return {
+        "messages": size * 100,
+        "common_p50_ms": round(common[len(common) // 2], 2),
+        "common_max_ms": round(common[-1], 2),
+        "rare_p50_ms": round(rare[len(rare) // 2], 2),
+        "rare_max_ms": round(rare[-1], 2),
+    }
+
+SCENARIOS = {
+    "reorder": scenario_reorder,
+    "sync": scenario_sync,
+    "sync_mirror": scenario_sync_mirror,
+    "solve": scenario_solve,
+    "private": scenario_private,
+    "export": scenario_export,
+    "leaderboard": scenario_leaderboard,
+    "ctftime": scenario_ctftime,
+    "search": scenario_search,
+}
+
+# -------------------- Runner --------------------
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run(args) -> dict:
+    api = FakeDiscord(latency=args.latency, bucket_limit=args.bucket_limit, bucket_window=args.bucket_window)
+    stub = StubServer()
+    await stub.start()
+    bot.CTFTIME_EVENTS_URL = f"{stub.url}/api/v1/events/"
+    await bot.http_client.start()
+    await bot.state_store.start()
+
+    results = []
+    try:
+        for name in args.scenarios:
+            for size in args.sizes:
+                await reset_bot_state()
+                api.reset()
+                stub.hits.clear()
+                bench = Bench(api, stub)
+                started = time.perf_counter()
+                extra = await SCENARIOS[name](bench, size)
+                wall = time.perf_counter() - started
+                await bot.state_store.flush()
+                result = {
+                    "scenario": name,
+                    "size": size,
+                    "wall_s": round(wall, 4),
+                    "api_calls": api.total,
+                    "api_calls_by_route": dict(sorted(api.calls.items())),
+                    "rate_limited": api.rate_limited,
+                    "http_requests": sum(stub.hits.values()),
+                    **extra,
+                }
+                results.append(result)
+                print(f"{name:>12} {size:>5}: {wall:8.3f}s  {api.total:>5} API calls  "
+                      f"{api.rate_limited:>4} rate limited  {result['http_requests']:>5} HTTP", file=sys.stderr)
+    finally:
+        await reset_bot_state()
+        await bot.state_store.close()
+        await bot.http_client.close()
+        await stub.stop()
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "latency": args.latency,
+            "bucket_limit": args.bucket_limit,
+            "bucket_window": args.bucket_window,
+        },
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated scenario sizes (default: %(default)s)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated scenarios to run (default: all)")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds per simulated Discord call")
+    parser.add_argument("--bucket-limit", type=int, default=5, help="calls allowed per rate-limit bucket and window")
+    parser.add_argument("--bucket-window", type=float, default=0.1, help="rate-limit window in seconds")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+    args.sizes = [int(s) for s in args.sizes.split(",")]
+    args.scenarios = args.scenarios.split(",")
+    unknown = [s for s in args.scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)  # state database and export archives stay out of the tree
+        report = asyncio.run(run(args))
+
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(os.path.join(ROOT, args.out) if not os.path.isabs(args.out) else args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Local aiohttp server standing in for CTFd, CTFTime and the Discord CDN."""
+import asyncio
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+from aiohttp import web
+
+CATEGORIES = ["web", "crypto", "pwn", "rev", "forensics", "misc"]
+
+class StubServer:
+    """Serves a CTFd with `challenges` challenges, a CTFTime event listing and attachment bytes."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, challenges: int = 10, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.challenges = challenges
+        self.latency = latency
+        self.hits = Counter()
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application(middlewares=[self._count])
+        app.router.add_get("/api/v1/challenges", self.challenge_list)
+        app.router.add_get("/api/v1/challenges/{id:\\d+}", self.challenge_detail)
+        app.router.add_get("/files/{key}/{name}", self.file)
+        app.router.add_get("/api/v1/events/", self.ctftime_events)
+        app.router.add_get("/cdn/{size:\\d+}/{name}", self.cdn)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+
+    @web.middleware
+    async def _count(self, request, handler):
+        self.hits[request.match_info.route.resource.canonical if request.match_info.route.resource else request.path] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return await handler(request)
+
+    async def challenge_list(self, request):
+        return web.json_response({"success": True, "data": [
+            {"id": i, "name": f"challenge {i}", "category": CATEGORIES[i % len(CATEGORIES)], "value": 100}
+            for i in range(1, self.challenges + 1)
+        ]})
+
+    async def challenge_detail(self, request):
+        i = int(request.match_info["id"])
+        return web.json_response({"success": True, "data": {
+            "id": i,
+            "name": f"challenge {i}",
+            "value": 100,
+            "description": f"Description of challenge {i}.",
+            "files": [f"/files/{i:08x}/handout{i}.zip?token=signed"],
+        }})
+
+    async def file(self, request):
+        return web.Response(body=request.match_info["key"].encode() * 256)
+
+    async def cdn(self, request):
+        return web.Response(body=b"x" * int(request.match_info["size"]))
+
+    async def ctftime_events(self, request):
+        start = datetime.now(timezone.utc) + timedelta(days=1)
+        events = [
+            {
+                "id": i,
+                "title": f"Event {i}",
+                "format": "Jeopardy",
+                "url": f"https://ctf{i}.example",
+                "ctftime_url": f"https://ctftime.org/event/{i}/",
+                "start": (start + timedelta(days=i)).isoformat(),
+                "finish": (start + timedelta(days=i, hours=48)).isoformat(),
+            }
+            for i in range(int(request.query.get("limit", 10)))
+        ]
+        return web.json_response(events, headers={"ETag": '"events"'})
@@ -1,31 +1,905 @@
 import discord
-import secrets
-import string
 import aiohttp
 import asyncio
+import bisect
+import hashlib
+import heapq
+import io
+import itertools
+import sqlite3
+import tempfile
+import threading
+import time
 import re
 import os
 import json
+import random
 import zipfile
-from discord.ui import Modal, TextInput, View, Select, Button, button
+from discord.ui import View, Button, button
 from discord.ext import commands, tasks
 from discord import app_commands, Interaction, TextChannel
-from discord import app_commands
 from datetime import datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
-from bs4 import BeautifulSoup
-from collections import defaultdict
+from collections import defaultdict, deque, namedtuple
+from contextlib import asynccontextmanager
+from yarl import URL
+
+# /search reads message text, which needs the privileged Message Content Intent. Enable it
+# for the bot in the developer portal before setting SEARCH_ENABLED=1, or login is refused.
+SEARCH_ENABLED = os.getenv("SEARCH_ENABLED") == "1"
 
 intents = discord.Intents.default()
 intents.guilds = True
 intents.members = True
+intents.message_content = SEARCH_ENABLED
 
-bot = commands.Bot(command_prefix="!", intents=intents)
 MAX_CONCURRENT_DOWNLOADS = 10 
 
-solved_logs = []
+# Sharding: leave unset for one process running every shard. To split shards
+# across processes give each the same SHARD_COUNT and its own SHARD_IDS (e.g. "0,1").
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0")) or None
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()] or None
+
+# Outbound HTTP (CTFTime, CTFd, Discord CDN downloads)
+HTTP_MAX_CONNECTIONS = 100       # total pooled connections
+HTTP_MAX_PER_HOST = 10           # pooled connections per host
+HTTP_KEEPALIVE_TIMEOUT = 30      # seconds an idle connection is kept open
+HTTP_DNS_CACHE_TTL = 300         # seconds DNS lookups are cached
+HTTP_TIMEOUT = 30                # seconds for a whole request
+HTTP_CONNECT_TIMEOUT = 10        # seconds to establish a connection
+HTTP_MAX_RETRIES = 3             # retries for idempotent requests
+HTTP_RETRY_BACKOFF = 1.0         # base seconds between retries (doubles each time)
+HTTP_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Attachment downloads may be large: no overall cap, only connect/read stalls
+DOWNLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=HTTP_CONNECT_TIMEOUT, sock_read=HTTP_TIMEOUT)
+
 ctf_events = []
-user_ctfd_data = {}
+user_ctfd_data = {}  # (guild id, CTFd URL) -> saved session
+ctfd_links = {}      # category id -> {"guild_id", "url", "autosolve"}
+
+# -------------------- Metrics --------------------
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))   # serve /metrics on 127.0.0.1:PORT when set
+METRICS_HOST = "127.0.0.1"
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LOOP_LAG_INTERVAL = 1.0    # seconds between event loop lag samples
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket)."""
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+def discord_route(path: str) -> str:
+    """Bounded route label for a Discord API path, e.g. /api/v10/channels/123/messages -> /channels/{id}/messages.
+
+    Interaction and webhook tokens are secrets and unique per call, so they
+    never reach a label.
+    """
+    route = re.sub(r"/\d{15,}", "/{id}", re.sub(r"^/api/v\d+", "", path))
+    route = re.sub(r"^/(interactions|webhooks)/\{id\}/[^/]+", r"/\1/{id}/{token}", route)
+    return re.sub(r"/reactions/[^/]+", "/reactions/{emoji}", route)
+
+class Metrics:
+    """In-process counters and latency histograms, rendered in Prometheus text format."""
+
+    def __init__(self):
+        self.counters = defaultdict(float)     # (name, labels) -> value
+        self.histograms = {}                   # (name, labels) -> Histogram
+        self.gauges = {}                       # name -> callable returning the current value
+        self.started = time.time()
+        self._tasks = []
+
+    @staticmethod
+    def _key(name: str, labels: dict):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels):
+        self.counters[self._key(name, labels)] += value
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    @asynccontextmanager
+    async def timer(self, name: str, **labels):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+            self.inc(name.replace("_seconds", "_total"), status=status, **labels)
+
+    def gauge(self, name: str, fn):
+        self.gauges[name] = fn
+
+    def counter_total(self, name: str, **match) -> float:
+        return sum(
+            value for (n, labels), value in self.counters.items()
+            if n == name and all(dict(labels).get(k) == v for k, v in match.items())
+        )
+
+    def trace_config(self, client: str) -> aiohttp.TraceConfig:
+        """aiohttp trace hooks counting requests by route and status for `client`."""
+        trace = aiohttp.TraceConfig()
+
+        async def on_start(session, ctx, params):
+            ctx.started = time.perf_counter()
+
+        async def on_end(session, ctx, params):
+            self._record_request(client, params.method, params.url, str(params.response.status), ctx)
+
+        async def on_exception(session, ctx, params):
+            self._record_request(client, params.method, params.url, "error", ctx)
+
+        trace.on_request_start.append(on_start)
+        trace.on_request_end.append(on_end)
+        trace.on_request_exception.append(on_exception)
+        return trace
+
+    def _record_request(self, client: str, method: str, url: URL, status: str, ctx):
+        if client == "discord":
+            route = discord_route(url.path)
+        else:
+            route = url.host or ""
+        self.inc("rest_requests_total", client=client, method=method, route=route, status=status)
+        if status == "429":
+            self.inc("rest_rate_limited_total", client=client, route=route)
+        self.observe("rest_request_seconds", time.perf_counter() - ctx.started, client=client, route=route)
+
+    def render(self) -> str:
+        def fmt(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{str(v).replace(chr(34), chr(39))}"' for k, v in pairs) + "}"
+
+        lines = []
+        for (name, labels), value in sorted(self.counters.items()):
+            lines.append(f"fl4gz_{name}{fmt(labels)} {value:g}")
+        for name, fn in sorted(self.gauges.items()):
+            lines.append(f"fl4gz_{name} {fn():g}")
+        for (name, labels), hist in sorted(self.histograms.items()):
+            cumulative = 0
+            for bound, count in zip(hist.buckets + (float("inf"),), hist.counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                lines.append(f"fl4gz_{name}_bucket{fmt(labels, [('le', le)])} {cumulative}")
+            lines.append(f"fl4gz_{name}_sum{fmt(labels)} {hist.sum:g}")
+            lines.append(f"fl4gz_{name}_count{fmt(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Start the loop lag sampler and, if METRICS_PORT is set, the local endpoint."""
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._sample_loop_lag()))
+        if METRICS_PORT:
+            self._tasks.append(asyncio.create_task(self._serve()))
+
+    async def _sample_loop_lag(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            self.observe("event_loop_lag_seconds", max(0.0, loop.time() - before - LOOP_LAG_INTERVAL))
+
+    async def _serve(self):
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type="text/plain", charset="utf-8")
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, METRICS_HOST, METRICS_PORT).start()
+            print(f"Serving metrics on http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+
+metrics = Metrics()
+
+class HTTPClient:
+    """One pooled aiohttp session shared by every outbound call of the bot."""
+
+    def __init__(self):
+        self.session = None
+
+    async def start(self):
+        if self.session and not self.session.closed:
+            return
+        connector = aiohttp.TCPConnector(
+            limit=HTTP_MAX_CONNECTIONS,
+            limit_per_host=HTTP_MAX_PER_HOST,
+            keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+            cookie_jar=aiohttp.DummyCookieJar(),  # shared session never keeps cookies
+            trace_configs=[metrics.trace_config("http")],
+        )
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+        self.session = None
+
+    async def new_session(self) -> aiohttp.ClientSession:
+        """Session with its own cookie jar (e.g. a CTFd login) that reuses the shared pool."""
+        await self.start()
+        return aiohttp.ClientSession(
+            connector=self.session.connector,
+            connector_owner=False,
+            timeout=self.session.timeout,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),  # CTFds are often served from a bare IP
+            trace_configs=[metrics.trace_config("http")],
+        )
+
+    @asynccontextmanager
+    async def request(self, method: str, url: str, *, session=None, retries=None, **kwargs):
+        """Send a request, retrying connection errors, timeouts, 429 and 5xx with backoff.
+
+        Only GET/HEAD are retried unless `retries` is given explicitly.
+        """
+        if session is None:
+            await self.start()
+            session = self.session
+        if retries is None:
+            retries = HTTP_MAX_RETRIES if method in ("GET", "HEAD") else 0
+
+        attempt = 0
+        while True:
+            delay = HTTP_RETRY_BACKOFF * (2 ** attempt)
+            try:
+                resp = await session.request(method, url, **kwargs)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                if attempt >= retries:
+                    raise
+            else:
+                if resp.status not in HTTP_RETRY_STATUSES or attempt >= retries:
+                    try:
+                        yield resp
+                    finally:
+                        resp.release()
+                    return
+                retry_after = resp.headers.get("Retry-After")
+                if retry_after and retry_after.replace(".", "", 1).isdigit():
+                    delay = max(delay, float(retry_after))
+                resp.release()
+            attempt += 1
+            metrics.inc("http_retries_total", host=URL(url).host or "")
+            await asyncio.sleep(delay)
+
+    def get(self, url: str, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+http_client = HTTPClient()
+
+# CTFTime event listing cache
+CTFTIME_EVENTS_URL = "https://ctftime.org/api/v1/events/"
+CTFTIME_EVENTS_LIMIT = 10     # one listing serves every caller; they slice what they need
+CTFTIME_CACHE_TTL = 300       # seconds a listing is served without revalidating
+
+class CTFTimeCache:
+    """Cached CTFTime event listing.
+
+    Fresh data is served from memory; stale data is served immediately while a
+    background refresh revalidates it with ETag/If-Modified-Since. Concurrent
+    callers share a single in-flight request.
+    """
+
+    def __init__(self, ttl: float = CTFTIME_CACHE_TTL):
+        self.ttl = ttl
+        self.events = None
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0.0
+        self._refresh_task = None
+
+    def is_fresh(self) -> bool:
+        return self.events is not None and asyncio.get_running_loop().time() - self.fetched_at < self.ttl
+
+    async def get_events(self, limit: int = CTFTIME_EVENTS_LIMIT):
+        """Return up to `limit` upcoming events, or None if CTFTime is unreachable and nothing is cached."""
+        if self.is_fresh():
+            return self.events[:limit]
+        task = self._refresh()
+        if self.events is not None:
+            return self.events[:limit]  # stale-while-revalidate
+        try:
+            await asyncio.shield(task)
+        except Exception:
+            pass
+        return self.events[:limit] if self.events is not None else None
+
+    def _refresh(self) -> asyncio.Task:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._fetch())
+        return self._refresh_task
+
+    async def _fetch(self):
+        headers = {}
+        if self.events is not None:
+            if self.etag:
+                headers["If-None-Match"] = self.etag
+            if self.last_modified:
+                headers["If-Modified-Since"] = self.last_modified
+        try:
+            async with http_client.get(CTFTIME_EVENTS_URL, params={"limit": CTFTIME_EVENTS_LIMIT}, headers=headers) as resp:
+                if resp.status == 304:
+                    self.fetched_at = asyncio.get_running_loop().time()
+                    return
+                if resp.status != 200:
+                    print(f"CTFTime returned {resp.status}")
+                    return
+                self.events = await resp.json(content_type=None)
+                self.etag = resp.headers.get("ETag")
+                self.last_modified = resp.headers.get("Last-Modified")
+                self.fetched_at = asyncio.get_running_loop().time()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            print(f"Error fetching CTFTime events: {e}")
+
+ctftime_cache = CTFTimeCache()
+
+# Persistent state
+STATE_DB_PATH = "bot_state.db"
+
+class StateStore:
+    """SQLite (WAL) store for CTF events, solves and CTFd sessions.
+
+    Writes go through a queue drained by a background writer, so command
+    handlers never wait on disk. Reads flush pending writes first and run in
+    a worker thread.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS ctf_events (
+            channel_id  INTEGER PRIMARY KEY,
+            guild_id    INTEGER,
+            name        TEXT NOT NULL,
+            url         TEXT,
+            start       TEXT NOT NULL,
+            end         TEXT NOT NULL,
+            description TEXT,
+            reminders   TEXT NOT NULL,
+            reminded    TEXT NOT NULL,
+            end_action  TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_ctf_events_guild ON ctf_events (guild_id, start);
+        CREATE INDEX IF NOT EXISTS idx_ctf_events_end ON ctf_events (end);
+
+        CREATE TABLE IF NOT EXISTS solves (
+            id        INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id  INTEGER,
+            ctf       TEXT,
+            channel   TEXT NOT NULL,
+            users     TEXT NOT NULL,
+            blooded   INTEGER NOT NULL,
+            time      TEXT NOT NULL,
+            solved_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_solves_guild_time ON solves (guild_id, solved_at);
+        CREATE INDEX IF NOT EXISTS idx_solves_guild_ctf ON solves (guild_id, ctf);
+
+        CREATE TABLE IF NOT EXISTS solve_users (
+            solve_id INTEGER NOT NULL REFERENCES solves (id) ON DELETE CASCADE,
+            user     TEXT NOT NULL,
+            PRIMARY KEY (solve_id, user)
+        );
+        CREATE INDEX IF NOT EXISTS idx_solve_users_user ON solve_users (user);
+
+        CREATE TABLE IF NOT EXISTS ctfd_sessions (
+            guild_id INTEGER NOT NULL,
+            url      TEXT NOT NULL,
+            data     TEXT NOT NULL,
+            PRIMARY KEY (guild_id, url)
+        );
+
+        CREATE TABLE IF NOT EXISTS ctfd_links (
+            category_id INTEGER PRIMARY KEY,
+            guild_id    INTEGER NOT NULL,
+            url         TEXT NOT NULL,
+            autosolve   INTEGER NOT NULL DEFAULT 0
+        );
+
+        CREATE TABLE IF NOT EXISTS ctfd_files (
+            file_key TEXT PRIMARY KEY,
+            sha256   TEXT NOT NULL,
+            size     INTEGER NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS mirrored_files (
+            channel_id INTEGER NOT NULL,
+            file_key   TEXT NOT NULL,
+            PRIMARY KEY (channel_id, file_key)
+        );
+
+        CREATE TABLE IF NOT EXISTS export_checkpoints (
+            channel_id      INTEGER PRIMARY KEY,
+            last_message_id INTEGER NOT NULL,
+            updated_at      REAL NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS attachment_blobs (
+            attachment_id INTEGER PRIMARY KEY,
+            channel_id    INTEGER NOT NULL,
+            sha256        TEXT NOT NULL,
+            size          INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_attachment_blobs_channel ON attachment_blobs (channel_id);
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS delete_jobs (
+            category_id INTEGER PRIMARY KEY,
+            guild_id    INTEGER NOT NULL,
+            name        TEXT NOT NULL,
+            channel_ids TEXT NOT NULL,
+            reason      TEXT,
+            export      INTEGER NOT NULL DEFAULT 0,
+            created_at  REAL NOT NULL
+        );
+
+        CREATE TABLE IF NOT EXISTS messages (
+            message_id  INTEGER PRIMARY KEY,
+            guild_id    INTEGER NOT NULL,
+            category_id INTEGER,
+            channel_id  INTEGER NOT NULL,
+            author_id   INTEGER NOT NULL,
+            author      TEXT NOT NULL,
+            created_at  REAL NOT NULL,
+            content     TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages (channel_id);
+
+        CREATE TABLE IF NOT EXISTS search_backfill (
+            channel_id      INTEGER PRIMARY KEY,
+            last_message_id INTEGER,
+            done            INTEGER NOT NULL DEFAULT 0
+        );
+    """
+
+    # Only created with SEARCH_ENABLED: the trigram tokenizer needs SQLite 3.34+ built with FTS5
+    SEARCH_SCHEMA = """
+        -- trigram tokens match any substring of 3+ characters: hex offsets, JWT fragments, flag parts
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5 (
+            content, content='messages', content_rowid='message_id', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+            INSERT INTO messages_fts (rowid, content) VALUES (new.message_id, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+            INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.message_id, old.content);
+            INSERT INTO messages_fts (rowid, content) VALUES (new.message_id, new.content);
+        END;
+    """
+
+    def __init__(self, path: str = STATE_DB_PATH):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+        self._queue = None
+        self._writer_task = None
+        self.search_ready = False   # the FTS index exists (SEARCH_ENABLED and SQLite supports it)
+
+    async def start(self):
+        if self._writer_task is not None:
+            return
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(self.SCHEMA)
+        if SEARCH_ENABLED:
+            try:
+                self._conn.executescript(self.SEARCH_SCHEMA)
+                self.search_ready = True
+            except sqlite3.OperationalError as e:
+                print(f"Search disabled, this SQLite can't build the index (needs 3.34+ with FTS5): {e}")
+        self._queue = asyncio.Queue()
+        self._writer_task = asyncio.create_task(self._writer())
+
+    async def close(self):
+        if self._writer_task is None:
+            return
+        await self.flush()
+        self._writer_task.cancel()
+        self._writer_task = None
+        self._conn.close()
+        self._conn = None
+
+    # ---- write-behind ----
+    def submit(self, fn):
+        """Queue `fn(conn)` to run inside the writer's next transaction."""
+        self._queue.put_nowait(fn)
+
+    def execute(self, sql: str, params=()):
+        self.submit(lambda conn: conn.execute(sql, params))
+
+    async def flush(self):
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _writer(self):
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._apply, batch)
+            except Exception as e:
+                print(f"Error writing state: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _apply(self, batch):
+        with self._lock, self._conn:
+            for fn in batch:
+                fn(self._conn)
+
+    # ---- reads ----
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    async def fetch(self, sql: str, params=()):
+        await self.flush()
+        return await asyncio.to_thread(self._query, sql, params)
+
+    # ---- CTF events ----
+    def save_ctf(self, ctf: dict):
+        self.execute(
+            "INSERT OR REPLACE INTO ctf_events VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                ctf["channel_id"], ctf.get("guild_id"), ctf["name"], ctf.get("url"),
+                ctf["start"].isoformat(), ctf["end"].isoformat(), ctf.get("description"),
+                json.dumps(ctf.get("reminders", [])), json.dumps(ctf.get("reminded", [])),
+                ctf.get("end_action", "announce"),
+            )
+        )
+
+    def delete_ctf(self, channel_id: int):
+        self.execute("DELETE FROM ctf_events WHERE channel_id = ?", (channel_id,))
+
+    async def load_ctfs(self) -> list:
+        rows = await self.fetch("SELECT * FROM ctf_events ORDER BY start")
+        return [
+            {
+                "name": r["name"],
+                "url": r["url"],
+                "start": datetime.fromisoformat(r["start"]),
+                "end": datetime.fromisoformat(r["end"]),
+                "description": r["description"],
+                "channel_id": r["channel_id"],
+                "guild_id": r["guild_id"],
+                "reminders": json.loads(r["reminders"]),
+                "reminded": json.loads(r["reminded"]),
+                "end_action": r["end_action"],
+            }
+            for r in rows
+        ]
+
+    # ---- solves ----
+    def add_solve(self, entry: dict):
+        def insert(conn):
+            cur = conn.execute(
+                "INSERT INTO solves (guild_id, ctf, channel, users, blooded, time, solved_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    entry.get("guild_id"), entry.get("ctf"), entry["channel"], json.dumps(entry["users"]),
+                    int(entry["blooded"]), entry["time"], entry.get("solved_at", time.time()),
+                )
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO solve_users (solve_id, user) VALUES (?, ?)",
+                [(cur.lastrowid, user) for user in entry["users"]]
+            )
+        self.submit(insert)
+
+    async def load_solves(self, guild_id: int = None) -> list:
+        if guild_id is None:
+            rows = await self.fetch("SELECT * FROM solves ORDER BY id")
+        else:
+            rows = await self.fetch("SELECT * FROM solves WHERE guild_id = ? ORDER BY id", (guild_id,))
+        return [
+            {
+                "guild_id": r["guild_id"],
+                "ctf": r["ctf"],
+                "channel": r["channel"],
+                "users": json.loads(r["users"]),
+                "blooded": bool(r["blooded"]),
+                "time": r["time"],
+                "solved_at": r["solved_at"],
+            }
+            for r in rows
+        ]
+
+    def clear_solves(self, guild_id: int):
+        self.execute("DELETE FROM solves WHERE guild_id = ?", (guild_id,))
+
+    # ---- CTFd sessions ----
+    def save_ctfd_session(self, guild_id: int, url: str, data: dict):
+        self.execute("INSERT OR REPLACE INTO ctfd_sessions VALUES (?, ?, ?)", (guild_id, url, json.dumps(data)))
+
+    async def load_ctfd_sessions(self) -> dict:
+        rows = await self.fetch("SELECT * FROM ctfd_sessions")
+        return {(r["guild_id"], r["url"]): json.loads(r["data"]) for r in rows}
+
+    def clear_ctfd_sessions(self, guild_id: int):
+        self.execute("DELETE FROM ctfd_sessions WHERE guild_id = ?", (guild_id,))
+
+    def save_ctfd_link(self, category_id: int, link: dict):
+        self.execute(
+            "INSERT OR REPLACE INTO ctfd_links VALUES (?, ?, ?, ?)",
+            (category_id, link["guild_id"], link["url"], int(link["autosolve"]))
+        )
+
+    async def load_ctfd_links(self) -> dict:
+        rows = await self.fetch("SELECT * FROM ctfd_links")
+        return {
+            r["category_id"]: {"guild_id": r["guild_id"], "url": r["url"], "autosolve": bool(r["autosolve"])}
+            for r in rows
+        }
+
+    def delete_ctfd_link(self, category_id: int):
+        self.execute("DELETE FROM ctfd_links WHERE category_id = ?", (category_id,))
+
+    # ---- mirrored CTFd files ----
+    async def get_ctfd_file(self, file_key: str):
+        rows = await self.fetch("SELECT sha256 FROM ctfd_files WHERE file_key = ?", (file_key,))
+        return rows[0]["sha256"] if rows else None
+
+    def add_ctfd_file(self, file_key: str, sha256: str, size: int):
+        self.execute("INSERT OR REPLACE INTO ctfd_files VALUES (?, ?, ?)", (file_key, sha256, size))
+
+    async def mirrored_keys(self, channel_id: int) -> set:
+        rows = await self.fetch("SELECT file_key FROM mirrored_files WHERE channel_id = ?", (channel_id,))
+        return {r["file_key"] for r in rows}
+
+    def add_mirrored(self, channel_id: int, file_keys: list):
+        self.submit(lambda conn: conn.executemany(
+            "INSERT OR IGNORE INTO mirrored_files VALUES (?, ?)", [(channel_id, key) for key in file_keys]
+        ))
+
+    # ---- incremental exports ----
+    async def get_checkpoint(self, channel_id: int):
+        rows = await self.fetch("SELECT last_message_id FROM export_checkpoints WHERE channel_id = ?", (channel_id,))
+        return rows[0]["last_message_id"] if rows else None
+
+    def set_checkpoint(self, channel_id: int, message_id: int):
+        self.execute(
+            "INSERT OR REPLACE INTO export_checkpoints VALUES (?, ?, ?)",
+            (channel_id, message_id, time.time())
+        )
+
+    async def get_blob(self, attachment_id: int):
+        rows = await self.fetch("SELECT sha256 FROM attachment_blobs WHERE attachment_id = ?", (attachment_id,))
+        return rows[0]["sha256"] if rows else None
+
+    def add_blob(self, attachment_id: int, channel_id: int, sha256: str, size: int):
+        self.execute(
+            "INSERT OR REPLACE INTO attachment_blobs VALUES (?, ?, ?, ?)",
+            (attachment_id, channel_id, sha256, size)
+        )
+
+    async def blobs_for_channels(self, channel_ids: list) -> list:
+        marks = ", ".join("?" for _ in channel_ids)
+        rows = await self.fetch(
+            f"SELECT DISTINCT sha256 FROM attachment_blobs WHERE channel_id IN ({marks})", tuple(channel_ids)
+        )
+        return [r["sha256"] for r in rows]
+
+    # ---- meta ----
+    async def get_meta(self, key: str):
+        rows = await self.fetch("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else None
+
+    def set_meta(self, key: str, value: str):
+        self.execute("INSERT OR REPLACE INTO meta VALUES (?, ?)", (key, value))
+
+    # ---- category deletions ----
+    def save_delete_job(self, job: dict):
+        self.execute(
+            "INSERT OR REPLACE INTO delete_jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job["category_id"], job["guild_id"], job["name"], json.dumps(job["channel_ids"]),
+             job.get("reason"), int(job.get("export", False)), job.get("created_at", time.time()))
+        )
+
+    def finish_delete_job(self, category_id: int):
+        self.execute("DELETE FROM delete_jobs WHERE category_id = ?", (category_id,))
+
+    async def load_delete_jobs(self) -> list:
+        rows = await self.fetch("SELECT * FROM delete_jobs ORDER BY created_at")
+        return [dict(r, channel_ids=json.loads(r["channel_ids"]), export=bool(r["export"])) for r in rows]
+
+    # ---- message search ----
+    def index_messages(self, rows: list):
+        """Add or update (message_id, guild_id, category_id, channel_id, author_id, author, created_at, content) rows."""
+        # an upsert, not INSERT OR REPLACE: replacing would skip the FTS delete trigger
+        self.submit(lambda conn: conn.executemany(
+            "INSERT INTO messages VALUES (?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (message_id) DO UPDATE SET content = excluded.content, category_id = excluded.category_id",
+            rows
+        ))
+
+    def delete_messages(self, message_ids: list):
+        self.submit(lambda conn: conn.executemany(
+            "DELETE FROM messages WHERE message_id = ?", [(message_id,) for message_id in message_ids]
+        ))
+
+    def delete_channel_messages(self, channel_id: int):
+        self.execute("DELETE FROM messages WHERE channel_id = ?", (channel_id,))
+        self.execute("DELETE FROM search_backfill WHERE channel_id = ?", (channel_id,))
+
+    async def search_messages(self, match: str, channel_ids: list, author_id: int = None,
+                              since: float = None, until: float = None, limit: int = 10,
+                              snippet_tokens: int = 64) -> list:
+        """Best `limit` matches of an FTS5 `match` expression among the given channels, best first."""
+        marks = ", ".join("?" for _ in channel_ids)
+        sql = (
+            "SELECT m.message_id, m.guild_id, m.channel_id, m.author, m.created_at, "
+            f"snippet(messages_fts, 0, '**', '**', '…', {int(snippet_tokens)}) AS snippet "
+            "FROM messages_fts JOIN messages m ON m.message_id = messages_fts.rowid "
+            f"WHERE messages_fts MATCH ? AND m.channel_id IN ({marks})"
+        )
+        params = [match, *channel_ids]
+        if author_id is not None:
+            sql += " AND m.author_id = ?"
+            params.append(author_id)
+        if since is not None:
+            sql += " AND m.created_at >= ?"
+            params.append(since)
+        if until is not None:
+            sql += " AND m.created_at < ?"
+            params.append(until)
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+        return await self.fetch(sql, tuple(params))
+
+    async def load_search_backfill(self) -> dict:
+        rows = await self.fetch("SELECT * FROM search_backfill")
+        return {r["channel_id"]: (r["last_message_id"], bool(r["done"])) for r in rows}
+
+    def set_search_backfill(self, channel_id: int, last_message_id, done: bool = False):
+        self.execute("INSERT OR REPLACE INTO search_backfill VALUES (?, ?, ?)", (channel_id, last_message_id, int(done)))
+
+    def reopen_search_backfill(self):
+        """Make the next backfill continue every channel from its last backfilled message."""
+        self.execute("UPDATE search_backfill SET done = 0 WHERE done = 1")
+
+state_store = StateStore()
+
+def owns_guild(guild_id) -> bool:
+    """Whether this process runs the shard serving `guild_id`.
+
+    State of guilds on other processes' shards is left alone, so reminders,
+    pollers and deletions never run twice.
+    """
+    if guild_id is None or bot.shard_ids is None:
+        return True
+    return (guild_id >> 22) % bot.shard_count in bot.shard_ids
+
+DEV_GUILD_ID = int(os.getenv("DEV_GUILD_ID", "0")) or None   # sync commands only to this guild (instant, for development)
+
+def command_fingerprint(guild=None) -> str:
+    payload = [cmd.to_dict(bot.tree) for cmd in bot.tree.get_commands(guild=guild)]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+async def sync_commands():
+    """Sync the command tree only when it changed since the last successful sync."""
+    guild = discord.Object(id=DEV_GUILD_ID) if DEV_GUILD_ID else None
+    if guild:
+        bot.tree.copy_global_to(guild=guild)
+    key = f"command_tree:{bot.application_id}:{DEV_GUILD_ID or 'global'}"
+    fingerprint = command_fingerprint(guild)
+    if await state_store.get_meta(key) == fingerprint:
+        print("Command tree unchanged, skipping sync.")
+        return
+    try:
+        synced = await bot.tree.sync(guild=guild)
+    except discord.HTTPException as e:
+        print(f"Error syncing commands: {e}")
+        return
+    state_store.set_meta(key, fingerprint)
+    print(f"Synced {len(synced)} command(s)" + (f" to guild {DEV_GUILD_ID}." if guild else "."))
+
+async def restore_state():
+    """Load persisted CTFs and CTFd sessions of this process's guilds and reschedule pending reminders."""
+    started = time.perf_counter()
+    ctf_events[:] = [ctf for ctf in await state_store.load_ctfs() if owns_guild(ctf.get("guild_id"))]
+    user_ctfd_data.update({k: v for k, v in (await state_store.load_ctfd_sessions()).items() if owns_guild(k[0])})
+    ctfd_links.update({k: v for k, v in (await state_store.load_ctfd_links()).items() if owns_guild(v["guild_id"])})
+    rebuild_leaderboards([entry for entry in await state_store.load_solves() if owns_guild(entry["guild_id"])])
+    for ctf in ctf_events:
+        reminder_scheduler.schedule(ctf)
+    print(f"Restored {len(ctf_events)} CTF(s) and {len(leaderboards)} leaderboard(s) in {time.perf_counter() - started:.3f}s.")
+
+class FlagTree(app_commands.CommandTree):
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        record_command(interaction, "error")
+        await super().on_error(interaction, error)
+
+def record_command(interaction: discord.Interaction, status: str):
+    """Count a finished command and its latency as seen by the user (since the interaction was sent)."""
+    name = interaction.command.qualified_name if interaction.command else "unknown"
+    metrics.inc("commands_total", command=name, status=status)
+    metrics.observe("command_seconds", (discord.utils.utcnow() - interaction.created_at).total_seconds(), command=name)
+
+async def start_background_tasks():
+    """Start the work that needs the channel cache, once the first READY has arrived."""
+    await bot.wait_until_ready()
+    reminder_scheduler.start()
+    #fetch_ctftime.start()
+    for category_id, link in ctfd_links.items():
+        if link["autosolve"]:
+            start_solve_poller(category_id)
+    await resume_category_deletions()
+    print(await reconcile_guilds(bot.guilds, rebuild_solves=RECONCILE_SOLVES))
+    if state_store.search_ready:
+        print(await backfill_search_index(bot.guilds))
+    else:
+        state_store.reopen_search_backfill()  # messages missed while search is off get backfilled later
+
+class FlagBot(commands.AutoShardedBot):
+    async def setup_hook(self):
+        # runs once per process; gateway reconnects fire on_ready again but never this
+        await http_client.start()
+        metrics.start()
+        await state_store.start()
+        await restore_state()
+        await sync_commands()
+        self._background = asyncio.create_task(start_background_tasks())
+
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        record_command(interaction, "ok")
+
+    async def close(self):
+        await http_client.close()
+        await state_store.close()
+        await super().close()
+
+bot = FlagBot(
+    command_prefix="!", intents=intents, tree_cls=FlagTree, http_trace=metrics.trace_config("discord"),
+    shard_count=SHARD_COUNT, shard_ids=SHARD_IDS,
+)
 
 class CTFSelectView(discord.ui.View):
     def __init__(self, events: list):
@@ -89,11 +963,14 @@ async def create_ctf_from_event(interaction: discord.Interaction, event: dict):
         "end": end,
         "description": desc,
         "channel_id": data_channel.id,
-        "reminded_1h": False,
-        "reminded_30m": False,
-        "reminded_10m": False
+        "guild_id": guild.id,
+        "reminders": list(REMINDER_OFFSETS),
+        "reminded": [],
+        "end_action": "announce"
     }
     ctf_events.append(ctf_data)
+    state_store.save_ctf(ctf_data)
+    reminder_scheduler.schedule(ctf_data)
 
     await data_channel.send(
         f"@everyone 📢 **New CTF Incoming!**\n"
@@ -115,13 +992,10 @@ async def create_ctf_from_event(interaction: discord.Interaction, event: dict):
 
 @bot.tree.command(name="ctf", description="📅 Pick a CTF from CTFTime and create channels automatically")
 async def create_ctf(interaction: discord.Interaction):
-    url = "https://ctftime.org/api/v1/events/?limit=10"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                await interaction.response.send_message("❌ Failed to fetch CTFs from ctftime.org.", ephemeral=True)
-                return
-            events = await resp.json()
+    events = await ctftime_cache.get_events(10)
+    if events is None:
+        await interaction.response.send_message("❌ Failed to fetch CTFs from ctftime.org.", ephemeral=True)
+        return
 
     view = CTFSelectView(events)
     await interaction.response.send_message("Select a CTF from the list:", view=view, ephemeral=True)
@@ -129,79 +1003,220 @@ async def create_ctf(interaction: discord.Interaction):
 @bot.event
 async def on_ready():
     print(f"Logged in as {bot.user}")
-    try:
-        synced = await bot.tree.sync()
-        print(f"Synced {len(synced)} command(s).")
-        check_reminders.start()
-        #fetch_ctftime.start()
-    except Exception as e:
-        print(f"Error syncing commands: {e}")
 
-@tasks.loop(minutes=1)
-async def check_reminders():
-    now_utc = datetime.now(timezone.utc)
-    for ctf in ctf_events[:]:
-        start_utc = ctf["start"].astimezone(timezone.utc)
-        end_utc = ctf["end"].astimezone(timezone.utc)
-        minutes_left = (start_utc - now_utc).total_seconds() / 60
+REMINDER_OFFSETS = [60, 30, 10]   # default minutes-before-start reminders
+REMINDER_GRACE = 300              # seconds a reminder may still go out late (e.g. after a restart)
+
+def format_offset(minutes: int) -> str:
+    if minutes % 60 == 0:
+        hours = minutes // 60
+        return f"{hours} hour" if hours == 1 else f"{hours} hours"
+    return f"{minutes} minute" if minutes == 1 else f"{minutes} minutes"
+
+def find_ctf(channel_id: int):
+    return next((c for c in ctf_events if c["channel_id"] == channel_id), None)
+
+def ctf_for_category(category_id: int):
+    """The scheduled CTF whose data channel lives in this category."""
+    for ctf in ctf_events:
         channel = bot.get_channel(ctf["channel_id"])
-        if not channel:
-            continue
+        if channel and channel.category_id == category_id:
+            return ctf
+    return None
+
+async def end_announce(ctf: dict, channel: discord.TextChannel):
+    text = f"✅ `{ctf['name']}` has ended and has been removed from the schedule."
+    progress = challenge_index.progress(channel.category_id)
+    if progress and progress[1]:
+        text += f" 🏁 Solved {progress[0]}/{progress[1]} challenges."
+    await channel.send(text)
+
+async def end_silent(ctf: dict, channel: discord.TextChannel):
+    pass
+
+END_ACTIONS = {
+    "announce": end_announce,
+    "silent": end_silent,
+}
+
+class ReminderScheduler:
+    """Deadline scheduler for CTF start reminders and end-of-event actions.
+
+    Entries live in a heap of (fire_time, seq, version, channel_id, kind, offset)
+    and the runner sleeps until the earliest one is due. Rescheduling a CTF
+    bumps its version, so its old entries are dropped lazily when popped.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._seq = itertools.count()
+        self._versions = {}
+        self._wakeup = None
+        self._task = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def _wake(self):
+        if self._wakeup:
+            self._wakeup.set()
+
+    def schedule(self, ctf: dict):
+        """(Re)schedule every pending reminder and the end action of a CTF."""
+        channel_id = ctf["channel_id"]
+        version = self._versions.get(channel_id, 0) + 1
+        self._versions[channel_id] = version
+
+        start_ts = ctf["start"].timestamp()
+        for offset in ctf.get("reminders", REMINDER_OFFSETS):
+            if offset not in ctf.get("reminded", []):
+                self._push(start_ts - offset * 60, version, channel_id, "remind", offset)
+        self._push(ctf["end"].timestamp(), version, channel_id, "end", None)
+        self._wake()
+
+    def unschedule(self, channel_id: int):
+        self._versions.pop(channel_id, None)
+        self._wake()
+
+    def pending(self) -> int:
+        return sum(1 for entry in self._heap if self._versions.get(entry[3]) == entry[2])
+
+    def _push(self, fire_time, version, channel_id, kind, offset):
+        heapq.heappush(self._heap, (fire_time, next(self._seq), version, channel_id, kind, offset))
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            while self._heap and self._versions.get(self._heap[0][3]) != self._heap[0][2]:
+                heapq.heappop(self._heap)  # superseded or unscheduled
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.time()
+            if delay > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
 
-        if not ctf["reminded_1h"] and minutes_left <= 60:
-            await channel.send(f"@everyone ⏰ **Reminder:** `{ctf['name']}` starts in 1 hour!", allowed_mentions=discord.AllowedMentions(everyone=True))
-            ctf["reminded_1h"] = True
-        elif not ctf["reminded_30m"] and minutes_left <= 30:
-            await channel.send(f"@everyone ⏰ **Reminder:** `{ctf['name']}` starts in 30 minutes!", allowed_mentions=discord.AllowedMentions(everyone=True))
-            ctf["reminded_30m"] = True
-        elif not ctf["reminded_10m"] and minutes_left <= 10:
-            await channel.send(f"@everyone ⏰ **Reminder:** `{ctf['name']}` starts in 10 minutes!", allowed_mentions=discord.AllowedMentions(everyone=True))
-            ctf["reminded_10m"] = True
-
-        if now_utc >= end_utc:
+            fire_time, _, _, channel_id, kind, offset = heapq.heappop(self._heap)
+            metrics.observe("task_lag_seconds", time.time() - fire_time, task="reminders")
+            try:
+                await self._fire(fire_time, channel_id, kind, offset)
+            except Exception as e:
+                print(f"Error firing {kind} for CTF channel {channel_id}: {e}")
+
+    async def _fire(self, fire_time: float, channel_id: int, kind: str, offset):
+        ctf = find_ctf(channel_id)
+        if ctf is None:
+            return
+        channel = bot.get_channel(channel_id)
+
+        if kind == "remind":
+            ctf.setdefault("reminded", []).append(offset)
+            state_store.save_ctf(ctf)
+            if channel and time.time() - fire_time <= REMINDER_GRACE:
+                await channel.send(
+                    f"@everyone ⏰ **Reminder:** `{ctf['name']}` starts in {format_offset(offset)}!",
+                    allowed_mentions=discord.AllowedMentions(everyone=True)
+                )
+        elif kind == "end":
             ctf_events.remove(ctf)
-            await channel.send(f"✅ `{ctf['name']}` has ended and has been removed from the schedule.")
+            state_store.delete_ctf(channel_id)
+            self._versions.pop(channel_id, None)
+            if channel:
+                action = END_ACTIONS.get(ctf.get("end_action", "announce"), end_announce)
+                await action(ctf, channel)
+
+reminder_scheduler = ReminderScheduler()
+metrics.gauge("reminders_pending", reminder_scheduler.pending)
+
+@bot.tree.command(name="reminders", description="⏰ Set reminder times and the end action for this category's CTF (Admin only)")
+@app_commands.describe(
+    offsets="Minutes before start to remind at, comma-separated (e.g. 120,60,10)",
+    end_action="What to do when the CTF ends"
+)
+@app_commands.choices(end_action=[app_commands.Choice(name=name, value=name) for name in END_ACTIONS])
+async def reminders(interaction: discord.Interaction, offsets: str, end_action: str = None):
+    if not is_admin(interaction):
+        await interaction.response.send_message("❌ You don’t have permission to use this command.", ephemeral=True)
+        return
+
+    category = getattr(interaction.channel, "category", None)
+    ctf = ctf_for_category(category.id) if category else None
+    if not ctf:
+        await interaction.response.send_message("❌ No scheduled CTF found for this category.", ephemeral=True)
+        return
+
+    try:
+        minutes = sorted({int(m) for m in offsets.replace(" ", "").split(",") if m}, reverse=True)
+    except ValueError:
+        await interaction.response.send_message("❌ Offsets must be whole minutes, e.g. `60,30,10`.", ephemeral=True)
+        return
+    if not minutes or minutes[-1] <= 0:
+        await interaction.response.send_message("❌ Offsets must be positive minutes, e.g. `60,30,10`.", ephemeral=True)
+        return
+
+    ctf["reminders"] = minutes
+    ctf["reminded"] = [m for m in ctf.get("reminded", []) if m in minutes]
+    if end_action:
+        ctf["end_action"] = end_action
+    state_store.save_ctf(ctf)
+    reminder_scheduler.schedule(ctf)
+
+    await interaction.response.send_message(
+        f"⏰ Reminders for `{ctf['name']}`: {', '.join(format_offset(m) for m in minutes)} before start; "
+        f"end action: `{ctf.get('end_action', 'announce')}`.",
+        ephemeral=True
+    )
 
 @tasks.loop(hours=24)
 async def fetch_ctftime():
-    url = "https://ctftime.org/api/v1/events/?limit=5"
     await bot.wait_until_ready()
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                return
-            events = await resp.json()
-
-    channel = discord.utils.get(bot.get_all_channels(), name="ctftime")
-    if not channel:
+    events = await ctftime_cache.get_events(5)
+    if events is None:
         return
 
-    for event in events:
-        name = event.get("title")
-        url = event.get("url")
-        format_ = event.get("format")
-        weight = event.get("weight")
-        start = datetime.fromisoformat(event.get("start"))
-        end = datetime.fromisoformat(event.get("finish"))
-        duration = event.get("duration", {}).get("days", 0)
-
-        embed = discord.Embed(title=name, url=url, color=discord.Color.orange())
-        embed.add_field(name="Duration", value=f"{duration} days, 0 hours", inline=True)
-        embed.add_field(name="Format", value=format_, inline=True)
-        embed.add_field(name="Weight", value=str(weight), inline=True)
-        embed.add_field(name="Timeframe", value=f"{start.strftime('%A, %d %B, %Y %H:%M')} -> {end.strftime('%A, %d %B, %Y %H:%M')}", inline=False)
-        await channel.send(embed=embed, allowed_mentions=discord.AllowedMentions(everyone=False))
+    embeds = [ctftime_embed(event) for event in events]
+
+    async def post(channel):
+        for embed in embeds:
+            await channel.send(embed=embed, allowed_mentions=discord.AllowedMentions(everyone=False))
+
+    # every server gets the listing in its own #ctftime, one failing guild doesn't stop the rest
+    channels = [c for c in (discord.utils.get(g.text_channels, name="ctftime") for g in bot.guilds) if c]
+    results = await asyncio.gather(*(post(c) for c in channels), return_exceptions=True)
+    for channel, result in zip(channels, results):
+        if isinstance(result, Exception):
+            print(f"Error posting CTFTime events in {channel.guild.name}: {result}")
+
+def ctftime_embed(event: dict) -> discord.Embed:
+    name = event.get("title")
+    url = event.get("url")
+    format_ = event.get("format")
+    weight = event.get("weight")
+    start = datetime.fromisoformat(event.get("start"))
+    end = datetime.fromisoformat(event.get("finish"))
+    duration = event.get("duration", {}).get("days", 0)
+
+    embed = discord.Embed(title=name, url=url, color=discord.Color.orange())
+    embed.add_field(name="Duration", value=f"{duration} days, 0 hours", inline=True)
+    embed.add_field(name="Format", value=format_, inline=True)
+    embed.add_field(name="Weight", value=str(weight), inline=True)
+    embed.add_field(name="Timeframe", value=f"{start.strftime('%A, %d %B, %Y %H:%M')} -> {end.strftime('%A, %d %B, %Y %H:%M')}", inline=False)
+    return embed
 
 @bot.tree.command(name="ctftime", description="📅 Manually fetch and post upcoming CTFs from CTFTime.org")
 async def ctftime(interaction: discord.Interaction):
     await interaction.response.defer()
-    url = "https://ctftime.org/api/v1/events/?limit=5"
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as resp:
-            if resp.status != 200:
-                await interaction.followup.send("❌ Failed to fetch CTFs from ctftime.org.")
-                return
-            events = await resp.json()
+    events = await ctftime_cache.get_events(5)
+    if events is None:
+        await interaction.followup.send("❌ Failed to fetch CTFs from ctftime.org.")
+        return
 
     channel = discord.utils.get(interaction.guild.text_channels, name="ctftime")
     if not channel:
@@ -209,20 +1224,7 @@ async def ctftime(interaction: discord.Interaction):
         return
 
     for event in events:
-        name = event.get("title")
-        url = event.get("url")
-        format_ = event.get("format")
-        weight = event.get("weight")
-        start = datetime.fromisoformat(event.get("start"))
-        end = datetime.fromisoformat(event.get("finish"))
-        duration = event.get("duration", {}).get("days", 0)
-
-        embed = discord.Embed(title=name, url=url, color=discord.Color.orange())
-        embed.add_field(name="Duration", value=f"{duration} days, 0 hours", inline=True)
-        embed.add_field(name="Format", value=format_, inline=True)
-        embed.add_field(name="Weight", value=str(weight), inline=True)
-        embed.add_field(name="Timeframe", value=f"{start.strftime('%A, %d %B, %Y %H:%M')} -> {end.strftime('%A, %d %B, %Y %H:%M')}", inline=False)
-        await channel.send(embed=embed, allowed_mentions=discord.AllowedMentions(everyone=False))
+        await channel.send(embed=ctftime_embed(event), allowed_mentions=discord.AllowedMentions(everyone=False))
     await interaction.followup.send("✅ Posted the latest CTFs in #ctftime.")
     
         
@@ -231,6 +1233,19 @@ async def ctftime(interaction: discord.Interaction):
 
 CATEGORY_ORDER = ["welcome","web", "crypto", "pwn", "rev", "forensics", "cloud", "ai", "boot2root", "misc"]
 
+def is_ctf_category(category) -> bool:
+    """Whether a category is a CTF's `--- name ---` category."""
+    return category is not None and category.name.startswith("--- ") and category.name.endswith(" ---")
+
+def ctf_name(category: discord.CategoryChannel) -> str:
+    """CTF name from a `--- name ---` category."""
+    if category is None:
+        return None
+    name = category.name
+    if is_ctf_category(category):
+        name = name[4:-4]
+    return name
+
 def category_priority(name: str) -> int:
     """Return index for category ordering, unknowns go last."""
     try:
@@ -238,51 +1253,642 @@ def category_priority(name: str) -> int:
     except ValueError:
         return len(CATEGORY_ORDER)  # unknown → bottom
 
-async def reorder_challenges(category: discord.CategoryChannel):
-    """Reorder challenge channels with hardcoded category order:
+SOLVED_PREFIXES = ("✅-", "🔥-")
+PINNED_CHANNELS = ("data", "chat")
+
+def solved_sort_key(name: str):
+    """Sort key inside the solved section: category order, then type, then full name."""
+    type_prefix = name[2:].split("-")[0]  # strip ✅- or 🔥-
+    return (category_priority(type_prefix), type_prefix, name.lower())
+
+def challenge_order(channels, names: dict = None) -> list:
+    """Return `channels` (in their current order) rearranged into the target order:
        - #data and #chat always at the very top
-       - Unsolved channels grouped by category order
+       - Unsolved channels grouped by category order (stable)
        - Solved channels grouped by category order, after unsolved
+    `names` maps channel id -> name, for renames the cache has not seen yet.
+    """
+    names = names or {}
+    def name_of(c):
+        return names.get(c.id, c.name)
+
+    pinned = [c for c in channels if name_of(c) in PINNED_CHANNELS]
+    others = [c for c in channels if name_of(c) not in PINNED_CHANNELS]
+
+    unsolved = [c for c in others if not name_of(c).startswith(SOLVED_PREFIXES)]
+    solved = [c for c in others if name_of(c).startswith(SOLVED_PREFIXES)]
+
+    unsolved.sort(key=lambda c: category_priority(name_of(c).split("-")[0]))
+    solved.sort(key=lambda c: solved_sort_key(name_of(c)))
+
+    return pinned + unsolved + solved
+
+def plan_positions(current: list, target: list) -> dict:
+    """Minimal position changes turning `current` order into `target` order.
+
+    The category keeps the position values it already occupies; they are
+    handed out again in target order and only channels whose value changes
+    are returned.
+    """
+    slots = sorted(c.position for c in current)
+    if len(set(slots)) != len(slots):
+        # ties (left by single-channel inserts) only order by id, spread them out
+        slots = list(range(slots[0], slots[0] + len(slots)))
+    return {c: pos for c, pos in zip(target, slots) if c.position != pos}
+
+def plan_single_move(current: list, target: list):
+    """{channel: position} moving just one channel, if that alone turns `current` into `target`.
+
+    Discord orders channels by (position, id), so the moved channel can share
+    a neighbour's position value instead of shifting every channel between
+    its old and new place. Returns None when one move isn't enough or no
+    position value fits.
+    """
+    first = next(i for i, (a, b) in enumerate(zip(current, target)) if a is not b)
+    for moved in (current[first], target[first]):
+        rest = [c for c in current if c is not moved]
+        if [c for c in target if c is not moved] != rest:
+            continue
+        index = target.index(moved)
+        before = (rest[index - 1].position, rest[index - 1].id) if index else None
+        after = (rest[index].position, rest[index].id) if index < len(rest) else None
+        base = before[0] if before else after[0] - 1
+        for pos in (base, base + 1):
+            key = (pos, moved.id)
+            if pos >= 0 and (before is None or before < key) and (after is None or key < after):
+                return {moved: pos}
+    return None
+
+async def bulk_move_channels(guild: discord.Guild, moves: dict, reason: str = None) -> int:
+    """Apply {channel: position} in one bulk request. Returns the number of API calls made."""
+    if not moves:
+        return 0
+    payload = [{"id": ch.id, "position": pos} for ch, pos in moves.items()]
+    # discord.py only exposes single-channel moves, which resend the whole bucket
+    await guild._state.http.bulk_channel_update(guild.id, payload, reason=reason)
+    for ch, pos in moves.items():
+        ch.position = pos  # keep the cache in step until the gateway confirms
+    return 1
+
+async def reorder_challenges(category: discord.CategoryChannel) -> int:
+    """Bring the category's text channels into challenge order.
+
+    When only one channel is out of place (the usual /solve) just that
+    channel is moved. Returns the number of API calls made (0 when already
+    ordered, else 1).
+    """
+    current = sorted(category.text_channels, key=lambda c: (c.position, c.id))
+    target = challenge_order(current)
+    if target == current:
+        return 0
+    moves = plan_single_move(current, target) or plan_positions(current, target)
+    return await bulk_move_channels(category.guild, moves)
+
+CATEGORY_CHANNEL_LIMIT = 50        # Discord allows at most 50 channels per category
+CHANNEL_CREATE_CONCURRENCY = 5     # channel creations in flight at once
+AUTOCOMPLETE_LIMIT = 25            # choices Discord shows in an autocomplete list
+
+def challenge_channel_name(type_: str, name: str) -> str:
+    return f"{type_.lower()}-{name.lower().replace(' ', '-')}"
+
+def base_channel_name(name: str) -> str:
+    """Channel name without the ✅-/🔥- solved prefix, lowercased."""
+    if name.startswith(SOLVED_PREFIXES):
+        name = name[2:]
+    return name.lower()
+
+ChallengeEntry = namedtuple("ChallengeEntry", "channel_id category_id base solved blooded")
+
+class ChallengeIndex:
+    """Challenge channels of each CTF category by base name, with their solved and first-blood state.
+
+    A category is indexed from its channel list the first time it is looked
+    up; after that the channel create/update/delete events keep it current,
+    so duplicate checks and solved lookups never walk the category.
     """
-    channels = list(category.channels)
 
-    # Always keep #data and #chat at top
-    pinned = [c for c in channels if c.name in ("data", "chat")]
+    def __init__(self):
+        self.categories = {}   # category id -> {base name: channel id}
+        self.entries = {}      # channel id -> ChallengeEntry
+
+    def rebuild(self, category: discord.CategoryChannel):
+        self.forget(category.id)
+        self.categories[category.id] = {}
+        for channel in category.text_channels:
+            self.add(channel)
+
+    def names(self, category: discord.CategoryChannel) -> dict:
+        """{base name: channel id} of the category, indexing it on first use."""
+        if category.id not in self.categories:
+            self.rebuild(category)
+        return self.categories[category.id]
+
+    def add(self, channel: discord.TextChannel):
+        """Index (or re-index after a rename or move) a channel; categories not indexed yet are skipped."""
+        self.remove(channel.id)
+        names = self.categories.get(channel.category_id)
+        if names is None or channel.name in PINNED_CHANNELS:
+            return
+        base = base_channel_name(channel.name)
+        names[base] = channel.id
+        self.entries[channel.id] = ChallengeEntry(
+            channel.id, channel.category_id, base,
+            channel.name.startswith(SOLVED_PREFIXES), channel.name.startswith("🔥-")
+        )
 
-    # Remaining channels
-    others = [c for c in channels if c not in pinned]
+    def remove(self, channel_id: int):
+        entry = self.entries.pop(channel_id, None)
+        if entry is None:
+            return
+        names = self.categories.get(entry.category_id)
+        if names is not None and names.get(entry.base) == channel_id:
+            del names[entry.base]
+
+    def mark_solved(self, channel: discord.TextChannel):
+        """Called once the solved prefix is on the cached channel name."""
+        self.add(channel)
+
+    def forget(self, category_id: int):
+        for channel_id in self.categories.pop(category_id, {}).values():
+            self.entries.pop(channel_id, None)
 
-    # Separate solved vs unsolved
-    unsolved = [c for c in others if not (c.name.startswith("✅-") or c.name.startswith("🔥-"))]
-    solved = [c for c in others if c.name.startswith("✅-") or c.name.startswith("🔥-")]
+    def find(self, category: discord.CategoryChannel, base: str):
+        """ChallengeEntry for the challenge called `base` in the category, or None."""
+        channel_id = self.names(category).get(base)
+        return self.entries.get(channel_id) if channel_id else None
 
-    # Sort unsolved by hardcoded category order
-    unsolved.sort(key=lambda c: category_priority(c.name.split("-")[0]))
+    def get(self, channel_id: int):
+        return self.entries.get(channel_id)
 
-    # Group solved by type prefix (without emoji prefix)
-    from collections import defaultdict
-    grouped_solved = defaultdict(list)
-    for c in solved:
-        name_without_prefix = c.name[2:]  # strip ✅- or 🔥-
-        type_prefix = name_without_prefix.split("-")[0]
-        grouped_solved[type_prefix].append(c)
+    def types(self, category: discord.CategoryChannel) -> set:
+        """Challenge types used in the category (the part of the name before the first dash)."""
+        return {base.split("-", 1)[0] for base in self.names(category)}
 
-    # Order solved by hardcoded category order
-    ordered_solved = []
-    for group in sorted(grouped_solved.keys(), key=category_priority):
-        ordered_solved.extend(sorted(grouped_solved[group], key=lambda c: c.name.lower()))
+    def progress(self, category_id: int):
+        """(solved, total) challenges of the category, or None if it isn't indexed."""
+        names = self.categories.get(category_id)
+        if names is None:
+            return None
+        return sum(self.entries[channel_id].solved for channel_id in names.values()), len(names)
 
-    # Final order: pinned first, then unsolved, then solved
-    final_order = pinned + unsolved + ordered_solved
+challenge_index = ChallengeIndex()
 
-    for index, ch in enumerate(final_order):
-        await ch.edit(position=index)
+@bot.event
+async def on_guild_channel_create(channel):
+    if isinstance(channel, discord.TextChannel):
+        challenge_index.add(channel)
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    if isinstance(after, discord.TextChannel) and (before.name, before.category_id) != (after.name, after.category_id):
+        challenge_index.add(after)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    if isinstance(channel, discord.CategoryChannel):
+        challenge_index.forget(channel.id)
+    else:
+        challenge_index.remove(channel.id)
+
+class PendingChannel:
+    """Stand-in for a channel that is about to be created, so it can be ordered."""
+
+    def __init__(self, name: str):
+        self.id = None
+        self.name = name
+
+async def create_challenge_channels(category: discord.CategoryChannel, names: list):
+    """Create `names` directly at their final positions in challenge order.
+
+    Existing channels that need to shift make room in one bulk update; no
+    reorder pass is needed afterwards. Returns (created channels, names left
+    out because the category is full).
+    """
+    return await channel_writes.run(category, lambda: _create_challenge_channels(category, names))
+
+async def _create_challenge_channels(category: discord.CategoryChannel, names: list):
+    room = max(0, CATEGORY_CHANNEL_LIMIT - len(category.channels))
+    names, overflow = names[:room], names[room:]
+    if not names:
+        return [], overflow
+
+    current = sorted(category.text_channels, key=lambda c: (c.position, c.id))
+    pending = [PendingChannel(name) for name in names]
+    target = challenge_order(current + pending)
+    base = current[0].position if current else 0
+    slots = {id(c): base + index for index, c in enumerate(target)}
+
+    await bulk_move_channels(category.guild, {c: slots[id(c)] for c in current if c.position != slots[id(c)]})
+
+    gate = asyncio.Semaphore(CHANNEL_CREATE_CONCURRENCY)
+
+    async def create(p: PendingChannel):
+        async with gate:
+            return await category.create_text_channel(p.name, position=slots[id(p)])
+
+    created = await asyncio.gather(*(create(p) for p in pending))
+    for channel in created:
+        challenge_index.add(channel)
+    return list(created), overflow
+
+def sync_summary(created: list, skipped: list, overflow: list) -> str:
+    def listing(items):
+        text = ", ".join(items)
+        return text if len(text) <= 500 else f"{len(items)} channels"
+
+    if not created and not overflow:
+        return "⚠️ No new channels created, all exist."
+    lines = []
+    if created:
+        lines.append(f"✅ Created channels: {listing([c.mention for c in created])}")
+    if skipped:
+        lines.append(f"⚠️ Skipped existing: {listing(skipped)}")
+    if overflow:
+        lines.append(f"⚠️ Category is full ({CATEGORY_CHANNEL_LIMIT} channels), not created: {listing(overflow)}")
+    return "\n".join(lines)
+
+# -------------------- Channel write queue --------------------
+DISCORD_WRITE_CONCURRENCY = 5   # channel mutations in flight at once, across all categories
+DISCORD_SLOW_WAIT = 10.0        # queue waits longer than this many seconds are logged
+
+class WriteJob:
+    def __init__(self, kind: str, target, fn=None):
+        self.kind = kind              # "edit", "delete", "reorder" or "run"
+        self.target = target
+        self.fields = {}
+        self.fn = fn
+        self.future = asyncio.get_running_loop().create_future()
+        self.enqueued = time.monotonic()
+
+    @property
+    def exclusive(self) -> bool:
+        """Reorders and creations touch the whole category and run on their own."""
+        return self.kind in ("reorder", "run")
+
+class ChannelWriteQueue:
+    """Single path for channel renames, permission edits, reorders and deletes.
+
+    Work is queued per category (a lane) and applied in order, so two admins
+    acting at once never reorder the same category in parallel. While a job
+    waits it absorbs later requests for the same target: edits to one channel
+    merge into one PATCH, deletes drop edits still pending for that channel,
+    and reorders collapse into one that runs after everything queued before
+    it. Consecutive edits/deletes of different channels run together, since
+    each channel has its own rate-limit bucket; reorders and creations share
+    the guild's bucket and run alone.
+    """
+
+    def __init__(self, concurrency: int = DISCORD_WRITE_CONCURRENCY):
+        self.lanes = {}                     # lane key -> deque of WriteJob
+        self.workers = {}                   # lane key -> worker task
+        self.gate = asyncio.Semaphore(concurrency)
+        self.running = 0
+        self.processed = 0
+        self.coalesced = 0
+        self.waits = deque(maxlen=200)      # recent queue waits in seconds
+
+    @staticmethod
+    def lane_key(target) -> int:
+        category = getattr(target, "category", None)
+        return category.id if category else target.id
+
+    def _pending(self, key: int, kind: str, target_id: int):
+        for job in self.lanes.get(key, ()):
+            if job.kind == kind and job.target.id == target_id:
+                return job
+        return None
+
+    def _enqueue(self, key: int, job: WriteJob) -> asyncio.Future:
+        self.lanes.setdefault(key, deque()).append(job)
+        worker = self.workers.get(key)
+        if worker is None or worker.done():
+            self.workers[key] = asyncio.create_task(self._work(key))
+        return job.future
+
+    def edit(self, channel, **fields) -> asyncio.Future:
+        """Queue `channel.edit(**fields)`, merged into an edit already waiting for it."""
+        key = self.lane_key(channel)
+        if self._pending(key, "delete", channel.id):
+            self.coalesced += 1
+            future = asyncio.get_running_loop().create_future()
+            future.set_result(None)
+            return future
+        job = self._pending(key, "edit", channel.id)
+        if job:
+            self.coalesced += 1
+            job.fields.update(fields)
+            return job.future
+        job = WriteJob("edit", channel)
+        job.fields.update(fields)
+        return self._enqueue(key, job)
+
+    def delete(self, channel, reason: str = None) -> asyncio.Future:
+        """Queue `channel.delete()`; edits still waiting for the channel are dropped."""
+        key = self.lane_key(channel)
+        job = self._pending(key, "delete", channel.id)
+        if job:
+            self.coalesced += 1
+            return job.future
+        edit = self._pending(key, "edit", channel.id)
+        if edit:
+            self.lanes[key].remove(edit)
+            self.coalesced += 1
+            edit.future.set_result(None)
+        job = WriteJob("delete", channel)
+        job.fields["reason"] = reason
+        return self._enqueue(key, job)
+
+    def reorder(self, category: discord.CategoryChannel) -> asyncio.Future:
+        """Queue a reorder of the category; a reorder already waiting moves to the back instead."""
+        job = self._pending(category.id, "reorder", category.id)
+        if job:
+            self.coalesced += 1
+            self.lanes[category.id].remove(job)
+            self.lanes[category.id].append(job)
+            return job.future
+        return self._enqueue(category.id, WriteJob("reorder", category))
+
+    def run(self, category: discord.CategoryChannel, fn) -> asyncio.Future:
+        """Queue `await fn()` as exclusive work on the category (e.g. creating channels)."""
+        return self._enqueue(category.id, WriteJob("run", category, fn))
+
+    async def _work(self, key: int):
+        lane = self.lanes[key]
+        while lane:
+            if lane[0].exclusive:
+                batch = [lane.popleft()]
+            else:
+                batch, seen = [], set()
+                while lane and not lane[0].exclusive and lane[0].target.id not in seen:
+                    seen.add(lane[0].target.id)
+                    batch.append(lane.popleft())
+            await asyncio.gather(*(self._apply(job) for job in batch))
+        del self.lanes[key]
+        self.workers.pop(key, None)
+
+    async def _apply(self, job: WriteJob):
+        async with self.gate:
+            wait = time.monotonic() - job.enqueued
+            self.waits.append(wait)
+            if wait > DISCORD_SLOW_WAIT:
+                print(f"Channel {job.kind} for {job.target.id} waited {wait:.1f}s in the write queue")
+            self.running += 1
+            try:
+                result = await self._call(job)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self.running -= 1
+                self.processed += 1
+
+    async def _call(self, job: WriteJob):
+        if job.kind == "edit":
+            result = await job.target.edit(**job.fields)
+            if "name" in job.fields:
+                job.target.name = job.fields["name"]  # reorders queued behind this see the new name
+            return result
+        if job.kind == "delete":
+            return await job.target.delete(reason=job.fields["reason"])
+        if job.kind == "reorder":
+            return await reorder_challenges(job.target)
+        return await job.fn()
+
+    def stats(self) -> dict:
+        waits = list(self.waits)
+        return {
+            "pending": sum(len(lane) for lane in self.lanes.values()),
+            "running": self.running,
+            "lanes": len(self.lanes),
+            "processed": self.processed,
+            "coalesced": self.coalesced,
+            "wait_avg": sum(waits) / len(waits) if waits else 0.0,
+            "wait_max": max(waits, default=0.0),
+        }
+
+channel_writes = ChannelWriteQueue()
+metrics.gauge("write_queue_pending", lambda: channel_writes.stats()["pending"])
+metrics.gauge("write_queue_running", lambda: channel_writes.stats()["running"])
+metrics.gauge("write_queue_coalesced_total", lambda: channel_writes.coalesced)
+
+# -------------------- CTFd client --------------------
+class CTFdError(Exception):
+    pass
+
+class CTFdClient:
+    """Authenticated CTFd session for one (guild, CTFd URL).
+
+    Uses an access token (`Authorization: Token ...`) when one is given and
+    never touches the HTML login page. Otherwise it logs in with the
+    username/password once, keeps the cookie jar and only logs in again
+    when CTFd reports the session has expired.
+    """
+
+    def __init__(self, guild_id: int, url: str, username: str = None, password: str = None,
+                 token: str = None, cookies: dict = None):
+        self.guild_id = guild_id
+        self.url = url
+        self.username = username
+        self.password = password
+        self.token = token
+        self._cookies = cookies or {}
+        self._session = None
+
+    @classmethod
+    def from_saved(cls, guild_id: int, url: str, data: dict):
+        return cls(guild_id, url, data.get("username"), data.get("password"), data.get("token"), data.get("cookies"))
+
+    def to_saved(self) -> dict:
+        return {"username": self.username, "password": self.password, "token": self.token, "cookies": self._cookies}
+
+    def save(self):
+        user_ctfd_data[(self.guild_id, self.url)] = self.to_saved()
+        state_store.save_ctfd_session(self.guild_id, self.url, self.to_saved())
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = await http_client.new_session()
+            if self._cookies:
+                self._session.cookie_jar.update_cookies(self._cookies, response_url=URL(self.url))
+        return self._session
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def login(self):
+        if not (self.username and self.password):
+            raise CTFdError("No CTFd credentials or access token saved for this CTF.")
+        session = await self.session()
+        session.cookie_jar.clear()
+
+        # 1️⃣ Get login page CSRF token
+        async with http_client.get(f"{self.url}/login", session=session) as resp:
+            html = await resp.text()
+        match = re.search(r'name=["\']nonce["\']\s+type=["\']hidden["\']\s+value=["\'](.+?)["\']', html)
+        if not match:
+            match = re.search(r'csrfNonce["\']\s*:\s*["\'](.+?)["\']', html)
+        if not match:
+            raise CTFdError("CSRF token not found on login page.")
+
+        # 2️⃣ Post login
+        login_payload = {
+            "name": self.username,
+            "password": self.password,
+            "nonce": match.group(1),
+            "_submit": "Submit"
+        }
+        headers = {"Content-Type": "application/x-www-form-urlencoded"}
+        async with http_client.post(f"{self.url}/login", session=session, data=login_payload, headers=headers) as resp:
+            if resp.status not in [200, 302] or resp.url.path.rstrip("/").endswith("/login"):
+                raise CTFdError(f"Login failed: {resp.status}")
+
+        self._cookies = {c.key: c.value for c in session.cookie_jar}
+        self.save()
+
+    @staticmethod
+    def _expired(resp: aiohttp.ClientResponse) -> bool:
+        # 401, or a bounce to /login, means the session is gone. 403 is CTFd saying
+        # the CTF hasn't started, has ended or is paused, which logging in again won't fix.
+        if resp.status == 401:
+            return True
+        if resp.status in (301, 302, 303):
+            return URL(resp.headers.get("Location", "")).path.rstrip("/").endswith("/login")
+        return bool(resp.history) and resp.url.path.rstrip("/").endswith("/login")  # followed there
+
+    @asynccontextmanager
+    async def request(self, method: str, path: str, **kwargs):
+        """Authenticated request to `path` (e.g. /api/v1/challenges), logging in only when needed."""
+        session = await self.session()
+        headers = dict(kwargs.pop("headers", None) or {})
+        headers.setdefault("Content-Type", "application/json")
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+        elif not self._cookies:
+            await self.login()
+        kwargs.setdefault("allow_redirects", False)
+
+        for attempt in range(2):
+            async with http_client.request(method, f"{self.url}{path}", session=session, headers=headers, **kwargs) as resp:
+                if not self._expired(resp):
+                    yield resp
+                    return
+                if self.token:
+                    raise CTFdError("CTFd rejected the access token.")
+                if attempt:
+                    raise CTFdError(f"CTFd refused the request after logging in again: {resp.status}")
+            await self.login()  # session expired
+
+    async def api(self, path: str, **kwargs):
+        """GET a CTFd API path and return its `data` field."""
+        async with self.request("GET", path, **kwargs) as resp:
+            if resp.status != 200:
+                hint = " (the CTF may not have started, have ended or be paused)" if resp.status == 403 else ""
+                raise CTFdError(f"CTFd returned {resp.status} for {path}{hint}")
+            payload = await resp.json(content_type=None)
+        return payload.get("data")
+
+ctfd_clients = {}
+
+async def get_ctfd_client(guild_id: int, url: str, username: str = None, password: str = None, token: str = None) -> CTFdClient:
+    """Reuse the guild's session for a CTFd, updating it with any newly given credentials."""
+    key = (guild_id, url)
+    client = ctfd_clients.get(key)
+    if client is None:
+        saved = user_ctfd_data.get(key)
+        client = CTFdClient.from_saved(guild_id, url, saved) if saved else CTFdClient(guild_id, url)
+        ctfd_clients[key] = client
+
+    changed = False
+    if token and token != client.token:
+        client.token, changed = token, True
+    if username and password and (username, password) != (client.username, client.password):
+        client.username, client.password, client._cookies, changed = username, password, {}, True
+    if changed:
+        client.save()
+    return client
+
+async def reset_ctfd_clients(guild_id: int = None):
+    """Close and forget the CTFd sessions of one guild, or of every guild."""
+    for key in [k for k in ctfd_clients if guild_id is None or k[0] == guild_id]:
+        await ctfd_clients.pop(key).close()
+    for key in [k for k in user_ctfd_data if guild_id is None or k[0] == guild_id]:
+        del user_ctfd_data[key]
+
+# -------------------- CTFd file mirroring --------------------
+MIRROR_CONCURRENCY = 4   # CTFd requests in flight at once while mirroring challenge files
+
+async def fetch_ctfd_file(client: CTFdClient, file_url: str, file_key: str):
+    """Local blob for a CTFd file, downloading it only if this file was never seen before."""
+    sha256 = await state_store.get_ctfd_file(file_key)
+    if sha256 and os.path.exists(blob_store.path(sha256)):
+        return sha256
+    path = file_url[len(client.url):] if file_url.startswith(client.url) else file_url
+    # CTFds that keep uploads in S3 answer with a redirect to a signed URL
+    async with client.request("GET", path, timeout=DOWNLOAD_TIMEOUT, allow_redirects=True) as resp:
+        if resp.status != 200:
+            raise CTFdError(f"CTFd returned {resp.status} for {file_key}")
+        sha256, size = await blob_store.put_response(resp)
+    state_store.add_ctfd_file(file_key, sha256, size)
+    return sha256
+
+async def mirror_challenge(client: CTFdClient, chall_id: int, channel: discord.TextChannel,
+                           post_description: bool, gate: asyncio.Semaphore) -> int:
+    """Post a challenge's description and any files not yet mirrored into its channel.
+
+    Returns the number of files posted.
+    """
+    async with gate:
+        detail = await client.api(f"/api/v1/challenges/{chall_id}") or {}
+
+    done = await state_store.mirrored_keys(channel.id)
+    pending = []
+    for file_url in detail.get("files") or []:
+        file_key = file_url.split("?", 1)[0]  # CTFd paths carry the upload hash, tokens vary
+        if file_key in done:
+            continue
+        async with gate:
+            sha256 = await fetch_ctfd_file(client, file_url, file_key)
+        pending.append((file_key, sha256, file_key.rsplit("/", 1)[-1]))
+
+    limit = channel.guild.filesize_limit
+    uploads = [f for f in pending if os.path.getsize(blob_store.path(f[1])) <= limit]
+    too_big = [f for f in pending if f not in uploads]
+
+    header = ""
+    if post_description:
+        header = f"📄 **{detail.get('name', channel.name)}** ({detail.get('value', '?')} pts)\n{detail.get('description') or ''}"
+    if too_big:
+        header += "\n⚠️ Too large to upload here, get from CTFd: " + ", ".join(f"`{name}`" for _, _, name in too_big)
+    header = header.strip()[:2000]
+
+    for start in range(0, max(len(uploads), 1), 10):  # Discord allows 10 files per message
+        batch = uploads[start:start + 10]
+        if not batch and not header:
+            break
+        await channel.send(
+            content=header or None,
+            files=[discord.File(blob_store.path(sha256), filename=name) for _, sha256, name in batch]
+        )
+        header = ""
+
+    state_store.add_mirrored(channel.id, [key for key, _, _ in pending])
+    return len(uploads)
 
 # -------------------- SyncChallengesModal --------------------
 class SyncChallengesModal(discord.ui.Modal, title="Sync CTFd Challenges"):
     ctfd_url = discord.ui.TextInput(label="CTFd URL", placeholder="https://example.ctfd.io")
-    username = discord.ui.TextInput(label="Username", placeholder="Enter your CTFd username")
-    password = discord.ui.TextInput(label="Password", placeholder="Enter your CTFd password ", style=discord.TextStyle.short)
+    username = discord.ui.TextInput(label="Username", placeholder="Enter your CTFd username", required=False)
+    password = discord.ui.TextInput(label="Password", placeholder="Enter your CTFd password ", style=discord.TextStyle.short, required=False)
+    token = discord.ui.TextInput(label="Access Token", placeholder="Optional: CTFd access token (ctfd_...)", required=False)
+
+    def __init__(self, mirror: bool = False):
+        super().__init__()
+        self.mirror = mirror
 
     async def on_submit(self, interaction: discord.Interaction):
         category = interaction.channel.category
@@ -291,80 +1897,70 @@ class SyncChallengesModal(discord.ui.Modal, title="Sync CTFd Challenges"):
 
         await interaction.response.defer(ephemeral=True)
 
-        ctfd_url = self.ctfd_url.value.rstrip("/")
-        username = self.username.value
-        password = self.password.value
+        async with metrics.timer("task_seconds", task="ctfd_sync"):
+            ctfd_url = self.ctfd_url.value.strip().rstrip("/")
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                # 1️⃣ Get login page CSRF token
-                async with session.get(f"{ctfd_url}/login") as resp:
-                    html = await resp.text()
-                match = re.search(r'name=["\']nonce["\']\s+type=["\']hidden["\']\s+value=["\'](.+?)["\']', html)
-                if not match:
-                    match = re.search(r'csrfNonce["\']\s*:\s*["\'](.+?)["\']', html)
-                if not match:
-                    return await interaction.followup.send("❌ CSRF token not found on login page.", ephemeral=True)
-                csrf_nonce = match.group(1)
-
-                # 2️⃣ Post login
-                login_payload = {
-                    "name": username,
-                    "password": password,
-                    "nonce": csrf_nonce,
-                    "_submit": "Submit"
-                }
-                headers = {"Content-Type": "application/x-www-form-urlencoded"}
-                async with session.post(f"{ctfd_url}/login", data=login_payload, headers=headers) as resp:
-                    if resp.status not in [200, 302]:
-                        return await interaction.followup.send(f"❌ Login failed: {resp.status}", ephemeral=True)
-
-                # 3️⃣ Fetch challenges
-                async with session.get(f"{ctfd_url}/api/v1/challenges") as resp:
-                    data = await resp.json()
-                challenges = data.get("data") or []
-
-                created = []
-                skipped = []
+            try:
+                # 1️⃣ Reuse the saved session for this CTFd (logs in only if needed)
+                client = await get_ctfd_client(
+                    interaction.guild_id, ctfd_url,
+                    self.username.value.strip(), self.password.value, self.token.value.strip()
+                )
+
+                # 2️⃣ Fetch challenges
+                challenges = await client.api("/api/v1/challenges") or []
 
-                # 4️⃣ Create channels with duplicate-checking
+                link = ctfd_links.get(category.id, {"autosolve": False})
+                link.update(guild_id=interaction.guild_id, url=ctfd_url)
+                ctfd_links[category.id] = link
+                state_store.save_ctfd_link(category.id, link)
+
+                # 3️⃣ Diff against the channels that already exist (solved ones included)
+                index = challenge_index.names(category)
+                missing = []
+                skipped = []
+                chall_ids = {}
                 for chall in challenges:
-                    name = chall.get("name")
                     type_ = chall.get("category") or chall.get("type") or "misc"
-                    base_name = f"{type_.lower()}-{name.lower().replace(' ', '-')}"
-
-                    # Check for duplicates including solved prefixes
-                    exists = False
-                    for ch in category.channels:
-                        check_name = ch.name
-                        if check_name.startswith("✅-") or check_name.startswith("🔥-"):
-                            check_name = check_name[2:]
-                        if check_name.lower() == base_name.lower():
-                            exists = True
-                            break
-                    if exists:
+                    base_name = challenge_channel_name(type_, chall.get("name"))
+                    if base_name in index or base_name in chall_ids:
                         skipped.append(base_name)
+                        chall_ids.setdefault(base_name, chall.get("id"))
                         continue
+                    chall_ids[base_name] = chall.get("id")
+                    missing.append(base_name)
+                existing = [(name, category.guild.get_channel(index[name])) for name in set(skipped) if name in index]
+
+                # 4️⃣ Create only the missing channels, each at its final position
+                created, overflow = await create_challenge_channels(category, missing)
+                msg = sync_summary(created, skipped, overflow)
+
+                # 5️⃣ Mirror descriptions and files; existing channels only get files they don't have yet
+                if self.mirror:
+                    gate = asyncio.Semaphore(MIRROR_CONCURRENCY)
+                    new_ids = {ch.id for ch in created}
+                    targets = [(name, ch) for name, ch in existing if ch is not None] + list(zip(missing, created))
+                    results = await asyncio.gather(
+                        *(mirror_challenge(client, chall_ids[name], ch, ch.id in new_ids, gate)
+                          for name, ch in targets if chall_ids.get(name) is not None),
+                        return_exceptions=True
+                    )
+                    posted = sum(r for r in results if isinstance(r, int))
+                    errors = [r for r in results if isinstance(r, Exception)]
+                    msg += f"\n📎 Mirrored {posted} new file(s) from CTFd."
+                    if errors:
+                        msg += f"\n⚠️ {len(errors)} challenge(s) could not be mirrored: {errors[0]}"
 
-                    new_ch = await category.create_text_channel(base_name)
-                    created.append(new_ch.mention)
-
-                # 5️⃣ Reorder channels consistently
-                await reorder_challenges(category)
-
-                msg = (
-                    f"✅ Created channels: {', '.join(created)}\n⚠️ Skipped existing: {', '.join(skipped)}"
-                    if created else f"⚠️ No new channels created, all exist."
-                )
                 await interaction.followup.send(msg, ephemeral=True)
 
-        except Exception as e:
-            await interaction.followup.send(f"❌ Error: {e}", ephemeral=True)
+            except Exception as e:
+                await interaction.followup.send(f"❌ Error: {e}", ephemeral=True)
 
 # -------------------- /fetch command --------------------
 @bot.tree.command(name="fetch", description="Fetch CTFd challenges and create channels dynamically")
-async def fetch(interaction: discord.Interaction):
-    await interaction.response.send_modal(SyncChallengesModal())
+@app_commands.describe(mirror="Also post each challenge's description and files into its channel")
+async def fetch(interaction: discord.Interaction, mirror: bool = False):
+    await interaction.response.send_modal(SyncChallengesModal(mirror))
 
 # -------------------- /challenge command --------------------
 @bot.tree.command(name="challenge", description="📂 Create a new challenge channel")
@@ -376,30 +1972,117 @@ async def challenge(interaction: discord.Interaction, type: str, name: str):
         return
 
     category = current_channel.category
-    base_name = f"{type.lower()}-{name.lower().replace(' ', '-')}"  # normalized new channel name
+    base_name = challenge_channel_name(type, name)  # normalized new channel name
 
     # ✅ Check all channels in the category (including solved ones)
-    for ch in category.channels:
-        check_name = ch.name
-        if check_name.startswith("✅-") or check_name.startswith("🔥-"):
-            check_name = check_name[2:]  
-        if check_name.lower() == base_name.lower():
-            await interaction.response.send_message(
-                f"⚠️ A challenge channel with the name `{base_name}` already exists in {category.name} "
-                f"({ch.mention}).",
-                ephemeral=True
-            )
-            return
+    existing = challenge_index.find(category, base_name)
+    if existing:
+        await interaction.response.send_message(
+            f"⚠️ A challenge channel with the name `{base_name}` already exists in {category.name} "
+            f"(<#{existing.channel_id}>).",
+            ephemeral=True
+        )
+        return
 
+    # creation is queued behind other channel writes and can outlast the 3s interaction deadline
+    await interaction.response.defer()
     try:
-        new_channel = await category.create_text_channel(base_name)
-
-        # Reorder consistently
-        await reorder_challenges(category)
+        # Created straight into its place in challenge order
+        created, overflow = await create_challenge_channels(category, [base_name])
+        if overflow:
+            await interaction.followup.send(
+                f"❌ `{category.name}` already has {CATEGORY_CHANNEL_LIMIT} channels.", ephemeral=True
+            )
+            return
 
-        await interaction.response.send_message(f"✅ Created new challenge channel: {new_channel.mention}")
+        await interaction.followup.send(f"✅ Created new challenge channel: {created[0].mention}")
     except discord.Forbidden:
-        await interaction.response.send_message("❌ Missing permission to create or reorder channels.", ephemeral=True)
+        await interaction.followup.send("❌ Missing permission to create or reorder channels.", ephemeral=True)
+
+def command_category(interaction: discord.Interaction):
+    return getattr(interaction.channel, "category", None)
+
+@challenge.autocomplete("type")
+async def challenge_type_autocomplete(interaction: discord.Interaction, current: str):
+    """The usual challenge types, then any other type already used in this category."""
+    types = [t for t in CATEGORY_ORDER if t != "welcome"]
+    category = command_category(interaction)
+    if category:
+        types += sorted(challenge_index.types(category) - set(types))
+    current = current.lower()
+    return [app_commands.Choice(name=t, value=t) for t in types if current in t][:AUTOCOMPLETE_LIMIT]
+
+@challenge.autocomplete("name")
+async def challenge_name_autocomplete(interaction: discord.Interaction, current: str):
+    """Challenges of the chosen type that already exist here, so duplicates show up while typing."""
+    category = command_category(interaction)
+    if category is None:
+        return []
+    prefix = challenge_channel_name(interaction.namespace.type or "", "")
+    current = current.lower().replace(" ", "-")
+    names = sorted(
+        base[len(prefix):] for base in challenge_index.names(category)
+        if base.startswith(prefix) and current in base[len(prefix):]
+    )
+    return [app_commands.Choice(name=f"{n[:80]} (already exists)", value=n) for n in names[:AUTOCOMPLETE_LIMIT]]
+
+def privacy_targets(category: discord.CategoryChannel) -> list:
+    return [category] + [c for c in category.channels if isinstance(c, (discord.TextChannel, discord.VoiceChannel))]
+
+def lift_view_deny(overwrites: dict, everyone) -> dict:
+    """`overwrites` with only @everyone's view_channel deny removed; everything else is kept."""
+    overwrites = dict(overwrites)
+    current = overwrites.pop(everyone, None)
+    if current is None or current.view_channel is not False:
+        if current is not None:
+            overwrites[everyone] = current
+        return overwrites
+    lifted = discord.PermissionOverwrite(**{perm: value for perm, value in current if value is not None})
+    lifted.update(view_channel=None)
+    if not lifted.is_empty():
+        overwrites[everyone] = lifted
+    return overwrites
+
+async def apply_category_overwrites(interaction: discord.Interaction, category: discord.CategoryChannel,
+                                    overwrites_for, state: str):
+    """Give the category and each of its channels `overwrites_for(channel)` and report on the deferred interaction.
+
+    Channels whose overwrites wouldn't change are skipped; the edits run
+    concurrently through the write queue.
+    """
+    targets = privacy_targets(category)
+    planned = {c: overwrites_for(c) for c in targets}
+    pending = [c for c in targets if c.overwrites != planned[c]]
+    skipped = len(targets) - len(pending)
+    if not pending:
+        await interaction.followup.send(
+            f"✅ Category `{category.name}` and all its channels are already {state}.", ephemeral=True
+        )
+        return
+
+    progress = ProgressReporter(await interaction.followup.send(
+        f"⏳ Making {len(pending)} channel(s) in `{category.name}` {state}...", ephemeral=True
+    ))
+    done = 0
+
+    async def apply(channel):
+        nonlocal done
+        await channel_writes.edit(channel, overwrites=planned[channel])
+        done += 1
+        progress.update(f"⏳ Making `{category.name}` {state}: {done}/{len(pending)} channels updated...")
+
+    results = await asyncio.gather(*(apply(c) for c in pending), return_exceptions=True)
+    failed = [(c, r) for c, r in zip(pending, results) if isinstance(r, Exception)]
+    summary = f"✅ Category `{category.name}` and all its channels are now {state}."
+    if skipped:
+        summary += f" ({len(pending) - len(failed)} updated, {skipped} already {state})"
+    if failed:
+        if any(isinstance(r, discord.Forbidden) for _, r in failed):
+            summary = "❌ Missing permission to edit channel or category permissions."
+        else:
+            summary = f"❌ Unexpected error: {failed[0][1]}"
+        summary += f"\n⚠️ Not updated: {', '.join(c.name for c, _ in failed)}"
+    await progress.finish(summary)
 
 @bot.tree.command(name="private", description="Make the current channel and its entire category private (Admin only)")
 async def private(interaction: discord.Interaction):
@@ -432,32 +2115,82 @@ async def private(interaction: discord.Interaction):
         interaction.guild.me: discord.PermissionOverwrite(view_channel=True, send_messages=True)  # Allow bot
     }
 
-    try:
-        # Update the category permissions to private
-        await category.edit(overwrites=private_overwrites)
+    # large categories take longer than the 3s response window
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    await apply_category_overwrites(interaction, category, lambda c: private_overwrites, "private")
 
-        # Update all channels in the category to private
-        for channel_in_category in category.channels:
-            if isinstance(channel_in_category, (discord.TextChannel, discord.VoiceChannel)):
-                await channel_in_category.edit(overwrites=private_overwrites)
+@bot.tree.command(name="public", description="Make the current channel and its entire category visible to everyone again (Admin only)")
+async def public(interaction: discord.Interaction):
+    if not is_admin(interaction):
+        await interaction.response.send_message("❌ You don’t have permission to use this command.", ephemeral=True)
+        return
 
-        await interaction.response.send_message(
-            f"✅ Category `{category.name}` and all its channels are now private.",
-            ephemeral=True
-        )
+    channel = interaction.channel
+    if not isinstance(channel, discord.TextChannel):
+        await interaction.response.send_message("❌ This command must be used in a text channel.", ephemeral=True)
+        return
 
-    except discord.Forbidden:
-        await interaction.response.send_message("❌ Missing permission to edit channel or category permissions.", ephemeral=True)
-    except Exception as e:
-        await interaction.response.send_message(f"❌ Unexpected error: {e}", ephemeral=True)
+    category = channel.category
+    if not category:
+        await interaction.response.send_message("❌ This channel is not in a category.", ephemeral=True)
+        return
+
+    # Each channel keeps its own overwrites, only the @everyone view deny is lifted
+    everyone = interaction.guild.default_role
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    await apply_category_overwrites(interaction, category, lambda c: lift_view_deny(c.overwrites, everyone), "public")
+
+async def mark_solved(channel: discord.TextChannel, solvers: list, is_blooded: bool):
+    """Rename and move a challenge channel into the solved section, announce and log the solve."""
+    old_name = channel.name
+    new_prefix = "🔥" if is_blooded else "✅"
+    new_name = f"{new_prefix}-{old_name}"
+
+    renamed = channel_writes.edit(channel, name=new_name)
+    placed = channel_writes.reorder(channel.category) if channel.category else None
+    await renamed
+    challenge_index.mark_solved(channel)
+    if placed:
+        await placed
+
+    solvers_text = ", ".join(solvers)
+    if is_blooded:
+        announcement = f"🎉 Congratulations to {solvers_text} on solving and getting `{old_name}`! 🔥 **(First Blood!)**"
+    else:
+        announcement = f"🎉 Congratulations to {solvers_text} for solving `{old_name}`!"
+
+    await channel.send(announcement)
+
+    entry = {
+        "guild_id": channel.guild.id,
+        "ctf": ctf_name(channel.category),
+        "channel": old_name,
+        "users": solvers,
+        "blooded": is_blooded,
+        "time": datetime.now(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M IST"),
+        "solved_at": time.time()
+    }
+    state_store.add_solve(entry)
+    leaderboards[entry["guild_id"]].add_solve(entry)
 
 @bot.tree.command(name="solve", description="Mark the current challenge channel as solved")
 @app_commands.describe(
     users="Users who solved the challenge (mention multiple)",
-    blooded="Was this a first blood? (yes/no)"
+    blooded="Was this a first blood? (yes/no)",
+    challenge="Challenge in this category to mark instead of the current channel"
 )
-async def solve(interaction: discord.Interaction, users: str, blooded: str):
+async def solve(interaction: discord.Interaction, users: str, blooded: str, challenge: str = None):
     target_channel = interaction.channel
+    if challenge:
+        category = command_category(interaction)
+        entry = challenge_index.find(category, challenge.lower()) if category else None
+        target_channel = interaction.guild.get_channel(entry.channel_id) if entry else None
+        if target_channel is None:
+            await interaction.response.send_message(
+                f"❌ No challenge channel `{challenge}` in this category.", ephemeral=True
+            )
+            return
+
     if not isinstance(target_channel, discord.TextChannel):
         await interaction.response.send_message(
             "❌ This command must be used inside a challenge text channel.", ephemeral=True
@@ -465,7 +2198,8 @@ async def solve(interaction: discord.Interaction, users: str, blooded: str):
         return
 
     old_name = target_channel.name
-    if old_name.startswith("✅-") or old_name.startswith("🔥-"):
+    entry = challenge_index.get(target_channel.id)
+    if entry.solved if entry else old_name.startswith(SOLVED_PREFIXES):
         await interaction.response.send_message(
             "⚠️ This challenge is already marked as solved.", ephemeral=True
         )
@@ -479,43 +2213,307 @@ async def solve(interaction: discord.Interaction, users: str, blooded: str):
         return
 
     is_blooded = blooded.lower() in ["yes", "y", "true", "1"]
-    new_prefix = "🔥" if is_blooded else "✅"
-    new_name = f"{new_prefix}-{old_name}"
 
-    try:
-        await target_channel.edit(name=new_name)
-        if target_channel.category:
-            channels = list(target_channel.category.channels)
-            unsolved = [c for c in channels if not (c.name.startswith("✅-") or c.name.startswith("🔥-"))]
-            solved = [c for c in channels if c.name.startswith("✅-") or c.name.startswith("🔥-")]
-
-            reordered = unsolved + solved
-            for index, channel in enumerate(reordered):
-                await channel.edit(position=index)
-
-        solvers_text = ", ".join(solver_mentions)
-        if is_blooded:
-            announcement = f"🎉 Congratulations to {solvers_text} on solving and getting `{old_name}`! 🔥 **(First Blood!)**"
-        else:
-            announcement = f"🎉 Congratulations to {solvers_text} for solving `{old_name}`!"
-
-        await target_channel.send(announcement)
-
-        solved_logs.append({
-            "channel": old_name,
-            "users": solver_mentions,
-            "blooded": is_blooded,
-            "time": datetime.now(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M IST")
-        })
+    # renames can be rate limited for minutes, answer within the 3s window first
+    await interaction.response.defer(ephemeral=True)
 
-        await interaction.response.send_message(
-            f"✅ Marked `{old_name}` as solved by {solvers_text}!", ephemeral=True
+    try:
+        await mark_solved(target_channel, solver_mentions, is_blooded)
+        await interaction.followup.send(
+            f"✅ Marked `{old_name}` as solved by {', '.join(solver_mentions)}!", ephemeral=True
         )
     except discord.Forbidden:
-        await interaction.response.send_message(
+        await interaction.followup.send(
             "❌ Missing permission to rename or reorder channels.", ephemeral=True
         )
 
+@solve.autocomplete("challenge")
+async def solve_challenge_autocomplete(interaction: discord.Interaction, current: str):
+    """Unsolved challenges of this category."""
+    category = command_category(interaction)
+    if category is None:
+        return []
+    current = current.lower()
+    names = sorted(
+        base for base, channel_id in challenge_index.names(category).items()
+        if current in base and not challenge_index.get(channel_id).solved
+    )
+    return [app_commands.Choice(name=n, value=n) for n in names[:AUTOCOMPLETE_LIMIT]]
+
+# -------------------- Startup reconciliation --------------------
+RECONCILE_CONCURRENCY = 5     # channel histories read at once while reconciling
+RECONCILE_DATA_SCAN = 20      # oldest messages of a #data channel searched for the CTF announcement
+RECONCILE_SOLVE_SCAN = 20     # newest messages of a solved channel searched for its announcement
+RECONCILE_SOLVES = os.getenv("RECONCILE_SOLVES") == "1"   # also recover solve logs at startup
+
+ANNOUNCEMENT_RE = re.compile(
+    r"\*\*Name:\*\* `(?P<name>[^`]*)`\n\*\*URL:\*\* (?P<url>\S*)\n"
+    r"\*\*Start:\*\* `(?P<start>[^`]+) IST`\n\*\*End:\*\* `(?P<end>[^`]+) IST`\n"
+    r"\*\*Description:\*\* (?P<description>.*?)(?:\n\n|$)",
+    re.S
+)
+CONGRATS_RE = re.compile(
+    r"🎉 Congratulations to (?P<users>.+?) (?:on solving and getting|for solving) `(?P<channel>[^`]+)`!(?P<blood>.*First Blood)?"
+)
+
+reconcile_slots = asyncio.Semaphore(RECONCILE_CONCURRENCY)
+
+def parse_announcement(content: str):
+    """CTF details from the bot's "New CTF Incoming!" message, or None."""
+    match = ANNOUNCEMENT_RE.search(content)
+    if not match:
+        return None
+    tz = ZoneInfo("Asia/Kolkata")
+    try:
+        start = datetime.strptime(match["start"], "%Y-%m-%d %I:%M %p").replace(tzinfo=tz)
+        end = datetime.strptime(match["end"], "%Y-%m-%d %I:%M %p").replace(tzinfo=tz)
+    except ValueError:
+        return None
+    return {"name": match["name"], "url": match["url"], "start": start, "end": end, "description": match["description"]}
+
+async def find_bot_message(channel: discord.TextChannel, limit: int, oldest_first: bool, predicate):
+    """First of the bot's messages among `limit` matching `predicate`, or None."""
+    async with reconcile_slots:
+        async for msg in channel.history(limit=limit, oldest_first=oldest_first):
+            if msg.author.id == bot.user.id and predicate(msg.content):
+                return msg
+    return None
+
+async def reconcile_ctf(category: discord.CategoryChannel) -> bool:
+    """Reschedule the category's CTF from its #data announcement if it is unknown and not over yet."""
+    data = discord.utils.get(category.text_channels, name="data")
+    if data is None or find_ctf(data.id):
+        return False
+    msg = await find_bot_message(data, RECONCILE_DATA_SCAN, True, lambda c: "New CTF Incoming!" in c)
+    details = parse_announcement(msg.content) if msg else None
+    if details is None or details["end"] <= datetime.now(timezone.utc):
+        return False
+
+    start_ts = details["start"].timestamp()
+    ctf = {
+        **details,
+        "channel_id": data.id,
+        "guild_id": category.guild.id,
+        "reminders": list(REMINDER_OFFSETS),
+        "reminded": [m for m in REMINDER_OFFSETS if start_ts - m * 60 < time.time()],  # don't send stale reminders
+        "end_action": "announce",
+    }
+    ctf_events.append(ctf)
+    state_store.save_ctf(ctf)
+    reminder_scheduler.schedule(ctf)
+    return True
+
+async def reconcile_solves(category: discord.CategoryChannel) -> int:
+    """Recover solve log entries from the Congratulations messages of a CTF with no logged solves."""
+    name = ctf_name(category)
+    index = leaderboards.get(category.guild.id)
+    if index and index.get(ctf=name):
+        return 0
+    solved = [ch for ch in category.text_channels if ch.name.startswith(SOLVED_PREFIXES)]
+    found = await asyncio.gather(*(
+        find_bot_message(ch, RECONCILE_SOLVE_SCAN, False, lambda c: c.startswith("🎉 Congratulations"))
+        for ch in solved
+    ))
+
+    entries = []
+    for channel, msg in zip(solved, found):
+        match = CONGRATS_RE.match(msg.content) if msg else None
+        if not match:
+            continue
+        entries.append({
+            "guild_id": category.guild.id,
+            "ctf": name,
+            "channel": match["channel"],
+            "users": [u.strip() for u in match["users"].split(",")],
+            "blooded": bool(match["blood"]) or channel.name.startswith("🔥-"),
+            "time": msg.created_at.astimezone(ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M IST"),
+            "solved_at": msg.created_at.timestamp(),
+        })
+    for entry in sorted(entries, key=lambda e: e["solved_at"]):
+        state_store.add_solve(entry)
+        leaderboards[entry["guild_id"]].add_solve(entry)
+    return len(entries)
+
+async def reconcile_category(category: discord.CategoryChannel, rebuild_solves: bool):
+    challenge_index.rebuild(category)
+    rescheduled = await reconcile_ctf(category)
+    recovered = await reconcile_solves(category) if rebuild_solves else 0
+    return rescheduled, recovered
+
+def ctf_categories(guilds) -> list:
+    return [
+        c for g in guilds for c in g.categories
+        if is_ctf_category(c) and c.id not in delete_jobs
+    ]
+
+async def reconcile_guilds(guilds, rebuild_solves: bool = False) -> str:
+    """Rebuild CTF schedules, the challenge index and optionally solve logs from the servers themselves.
+
+    Categories are scanned concurrently and each channel only by its first or
+    last few messages, so a server with many past CTFs is done in seconds.
+    """
+    started = time.perf_counter()
+    categories = ctf_categories(guilds)
+    results = await asyncio.gather(
+        *(reconcile_category(c, rebuild_solves) for c in categories), return_exceptions=True
+    )
+    rescheduled = sum(r[0] for r in results if not isinstance(r, Exception))
+    recovered = sum(r[1] for r in results if not isinstance(r, Exception))
+    errors = [r for r in results if isinstance(r, Exception)]
+    text = (
+        f"Reconciled {len(categories)} CTF categories in {time.perf_counter() - started:.1f}s: "
+        f"{rescheduled} CTF(s) rescheduled, {recovered} solve(s) recovered."
+    )
+    if errors:
+        text += f" {len(errors)} categor{'y' if len(errors) == 1 else 'ies'} failed: {errors[0]}"
+    return text
+
+@bot.tree.command(name="reconcile", description="🔄 Rebuild CTF schedules and solve state from this server's channels (Admin only)")
+@app_commands.describe(solves="Also recover solve logs from Congratulations messages for CTFs with no logged solves")
+async def reconcile(interaction: discord.Interaction, solves: bool = False):
+    if not is_admin(interaction):
+        await interaction.response.send_message("❌ You don’t have permission to use this command.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True, thinking=True)
+    text = await reconcile_guilds([interaction.guild], rebuild_solves=solves)
+    await interaction.followup.send(f"🔄 {text}", ephemeral=True)
+
+# -------------------- CTFd solve poller --------------------
+SOLVE_POLL_MIN = 30                # seconds between polls near the start or while solves come in
+SOLVE_POLL_MAX = 300               # seconds between polls once the team has gone quiet
+SOLVE_POLL_FAST_WINDOW = 2 * 3600  # poll at the fastest rate for this long after the CTF starts
+
+class SolvePoller:
+    """Polls a CTFd for the team's solves and marks new ones in the linked category."""
+
+    def __init__(self, category_id: int, guild_id: int, url: str):
+        self.category_id = category_id
+        self.guild_id = guild_id
+        self.url = url
+        self.interval = SOLVE_POLL_MIN
+        self.etag = None
+        self.known = set()  # challenge ids already handled
+        self.solves_path = "/api/v1/teams/me/solves"
+        self.started = time.time()
+        self.task = None
+
+    def start(self):
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self.task:
+            self.task.cancel()
+            self.task = None
+
+    def _fast_phase(self) -> bool:
+        ctf = ctf_for_category(self.category_id)
+        start = ctf["start"].timestamp() if ctf else self.started
+        return time.time() - start < SOLVE_POLL_FAST_WINDOW
+
+    async def _run(self):
+        while True:
+            try:
+                async with metrics.timer("task_seconds", task="solve_poll"):
+                    marked = await self.poll()
+            except Exception as e:
+                # anything else (a non-JSON body, a malformed solve) would end the task while autosolve stays on
+                print(f"Solve poll failed for {self.url}: {e!r}")
+                metrics.inc("solve_poll_errors_total", error=type(e).__name__)
+                marked = 0
+            if marked or self._fast_phase():
+                self.interval = SOLVE_POLL_MIN
+            else:
+                self.interval = min(self.interval * 2, SOLVE_POLL_MAX)
+            await asyncio.sleep(self.interval)
+
+    async def _fetch_solves(self, client: CTFdClient):
+        """The team's solves, or None when nothing changed since the last poll."""
+        headers = {"If-None-Match": self.etag} if self.etag else {}
+        async with client.request("GET", self.solves_path, headers=headers) as resp:
+            if resp.status == 304:
+                return None
+            if resp.status == 404 and self.solves_path.startswith("/api/v1/teams"):
+                self.solves_path = "/api/v1/users/me/solves"  # user-mode CTF
+                return []
+            if resp.status != 200:
+                raise CTFdError(f"CTFd returned {resp.status} for {self.solves_path}")
+            self.etag = resp.headers.get("ETag")
+            return (await resp.json(content_type=None)).get("data") or []
+
+    async def _first_blood(self, client: CTFdClient, solve: dict) -> bool:
+        owner = solve.get("team") or solve.get("user") or {}
+        try:
+            solves = await client.api(f"/api/v1/challenges/{solve['challenge_id']}/solves")
+        except CTFdError:
+            return False
+        return bool(solves) and solves[0].get("account_id") == owner.get("id")
+
+    async def poll(self) -> int:
+        """Mark channels for solves not seen before. Returns how many were marked."""
+        category = bot.get_channel(self.category_id)
+        if category is None:
+            return 0
+        client = await get_ctfd_client(self.guild_id, self.url)
+        solves = await self._fetch_solves(client)
+        new = [x for x in solves or [] if x.get("challenge_id") is not None and x["challenge_id"] not in self.known]
+        if not new:
+            return 0
+
+        marked = 0
+        for solve in new:
+            chall = solve.get("challenge") or {}
+            entry = challenge_index.find(category, challenge_channel_name(chall.get("category") or "misc", chall.get("name") or ""))
+            channel = category.guild.get_channel(entry.channel_id) if entry else None
+            if channel is None:
+                # released after the last /fetch: retry once its channel exists, and
+                # drop the ETag so an unchanged solve list isn't answered with a 304
+                self.etag = None
+                continue
+            if not entry.solved:
+                solver = (solve.get("user") or {}).get("name") or "the team"
+                member = category.guild.get_member_named(solver)
+                await mark_solved(channel, [member.mention if member else solver], await self._first_blood(client, solve))
+                marked += 1
+            self.known.add(solve["challenge_id"])
+        return marked
+
+solve_pollers = {}
+
+def start_solve_poller(category_id: int):
+    link = ctfd_links[category_id]
+    poller = solve_pollers.get(category_id)
+    if poller is None:
+        poller = solve_pollers[category_id] = SolvePoller(category_id, link["guild_id"], link["url"])
+    poller.start()
+
+def stop_solve_poller(category_id: int):
+    poller = solve_pollers.pop(category_id, None)
+    if poller:
+        poller.stop()
+
+@bot.tree.command(name="autosolve", description="🤖 Auto-mark solves by polling this category's CTFd (Admin only)")
+@app_commands.describe(enabled="Turn automatic solve tracking on or off")
+async def autosolve(interaction: discord.Interaction, enabled: bool):
+    if not is_admin(interaction):
+        await interaction.response.send_message("❌ You don’t have permission to use this command.", ephemeral=True)
+        return
+
+    category = getattr(interaction.channel, "category", None)
+    link = ctfd_links.get(category.id) if category else None
+    if not link:
+        await interaction.response.send_message("❌ Run `/fetch` in this category first to link it to a CTFd.", ephemeral=True)
+        return
+
+    link["autosolve"] = enabled
+    state_store.save_ctfd_link(category.id, link)
+    if enabled:
+        start_solve_poller(category.id)
+        await interaction.response.send_message(f"🤖 Watching {link['url']} for new solves.", ephemeral=True)
+    else:
+        stop_solve_poller(category.id)
+        await interaction.response.send_message("🤖 Automatic solve tracking turned off.", ephemeral=True)
+
 def is_admin(interaction: discord.Interaction) -> bool:
     """Check if the user has the Admin role or manage_guild permission"""
     admin_role = discord.utils.get(interaction.guild.roles, name="Admin")
@@ -526,14 +2524,15 @@ def is_admin(interaction: discord.Interaction) -> bool:
 
 @bot.tree.command(name="backup", description="Backup solved challenge logs to a file")
 async def backup(interaction: discord.Interaction):
-    if not solved_logs:
+    solves = await state_store.load_solves(interaction.guild_id)
+    if not solves:
         await interaction.response.send_message("📂 No logs to backup.", ephemeral=True)
         return
 
     filename = f"solved_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
 
     with open(filename, "w", encoding="utf-8") as f:
-        for entry in solved_logs:
+        for entry in solves:
             emoji = "🔥" if entry["blooded"] else "✅"
             users = ", ".join(entry["users"])
             f.write(f"{emoji} {entry['channel']} → {users} at {entry['time']}\n")
@@ -546,47 +2545,771 @@ async def backup(interaction: discord.Interaction):
 
 @bot.tree.command(name="logs", description="Show logs of solved challenges")
 async def logs(interaction: discord.Interaction):
-    if not solved_logs:
+    solves = await state_store.load_solves(interaction.guild_id)
+    if not solves:
         await interaction.response.send_message("📜 No challenges solved yet.", ephemeral=True)
         return
 
     log_messages = []
-    for entry in solved_logs:
+    for entry in solves:
         emoji = "🔥" if entry["blooded"] else "✅"
         users = ", ".join(entry["users"])
         log_messages.append(f"{emoji} `{entry['channel']}` → {users} at {entry['time']}")
 
     await interaction.response.send_message("\n".join(log_messages), ephemeral=True)
 
+def format_seconds(value: float) -> str:
+    if value == float("inf"):
+        return f">{LATENCY_BUCKETS[-1]}s"
+    return f"{value * 1000:.0f}ms" if value < 1 else f"{value:g}s"
+
+def stats_report() -> str:
+    uptime = timedelta(seconds=int(time.time() - metrics.started))
+    lines = [f"📊 **Bot stats** (up {uptime})", "", "**Commands** (count · p50 · p95)"]
+    commands_seen = sorted(
+        ((dict(labels)["command"], hist) for (name, labels), hist in metrics.histograms.items() if name == "command_seconds"),
+        key=lambda item: -item[1].count
+    )
+    for command, hist in commands_seen[:10]:
+        errors = metrics.counter_total("commands_total", command=command, status="error")
+        lines.append(
+            f"`/{command}` {hist.count} · {format_seconds(hist.quantile(0.5))} · {format_seconds(hist.quantile(0.95))}"
+            + (f" · ⚠️ {errors:g} failed" if errors else "")
+        )
+    if not commands_seen:
+        lines.append("No commands yet.")
+
+    lines += ["", "**Outbound calls**"]
+    for client, label in (("discord", "Discord REST"), ("http", "HTTP (CTFd/CTFTime/CDN)")):
+        lines.append(
+            f"{label}: {metrics.counter_total('rest_requests_total', client=client):g} calls, "
+            f"{metrics.counter_total('rest_rate_limited_total', client=client):g} rate limited"
+        )
+    lines.append(f"HTTP retries: {metrics.counter_total('http_retries_total'):g}")
+
+    queue = channel_writes.stats()
+    lines += [
+        "",
+        f"**Write queue**: {queue['pending']} pending, {queue['running']} running, {queue['coalesced']} coalesced, "
+        f"wait avg {format_seconds(queue['wait_avg'])} / max {format_seconds(queue['wait_max'])}",
+    ]
+    lag = metrics.histograms.get(metrics._key("event_loop_lag_seconds", {}))
+    if lag:
+        lines.append(f"**Event loop lag** p95: {format_seconds(lag.quantile(0.95))}")
+    exported = metrics.counter_total("export_bytes_total")
+    if exported:
+        lines.append(f"**Exported**: {exported / (1024 * 1024):.1f} MB")
+    return "\n".join(lines)
+
+@bot.tree.command(name="stats", description="📊 Show command latency, API call and queue statistics (Admin only)")
+async def stats(interaction: discord.Interaction):
+    if not is_admin(interaction):
+        await interaction.response.send_message("❌ You don’t have permission to use this command.", ephemeral=True)
+        return
+    await interaction.response.send_message(stats_report(), ephemeral=True)
+
+LEADERBOARD_PAGE_SIZE = 10
+
+def normalize_mention(user: str) -> str:
+    return user.replace("<@!", "<@", 1)
+
+class SkipNode:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [0] * levels   # positions from this node to next[level]
+
+class RankedKeys:
+    """Sorted distinct keys in an indexable skip list.
+
+    Insert, remove and index lookups take O(log n) expected steps; a slice
+    of k keys from index i takes O(log n + k). Only the levels in use are
+    walked, so small lists stay cheap.
+    """
+
+    LEVELS = 20   # enough for ~1M keys before lookups start to slow down
+
+    def __init__(self):
+        self.head = SkipNode(None, self.LEVELS)
+        self.head.width = [1] * self.LEVELS   # head sits at index -1, the end at index size
+        self.level = 1                        # levels in use; head widths above it are stale
+        self.size = 0
+
+    @classmethod
+    def from_sorted(cls, keys: list) -> "RankedKeys":
+        """Build from already sorted distinct keys in O(n)."""
+        self = cls()
+        last = [self.head] * self.LEVELS
+        last_index = [-1] * self.LEVELS
+        for index, key in enumerate(keys):
+            node = SkipNode(key, self._random_levels())
+            for level in range(len(node.next)):
+                last[level].next[level] = node
+                last[level].width[level] = index - last_index[level]
+                last[level], last_index[level] = node, index
+            self.level = max(self.level, len(node.next))
+        for level in range(self.level):
+            last[level].width[level] = len(keys) - last_index[level]
+        self.size = len(keys)
+        return self
+
+    def __len__(self):
+        return self.size
+
+    def _random_levels(self) -> int:
+        levels = 1
+        while levels < self.LEVELS and random.random() < 0.5:
+            levels += 1
+        return levels
+
+    def _path(self, key):
+        """Last node before `key` on each level in use, and its index."""
+        chain = [self.head] * self.level
+        steps = [-1] * self.level
+        node, pos = self.head, -1
+        for level in reversed(range(self.level)):
+            while node.next[level] is not None and node.next[level].key < key:
+                pos += node.width[level]
+                node = node.next[level]
+            chain[level], steps[level] = node, pos
+        return chain, steps
+
+    def insert(self, key):
+        chain, steps = self._path(key)
+        index = steps[0] + 1
+        node = SkipNode(key, self._random_levels())
+        levels = len(node.next)
+        for level in range(self.level, levels):
+            # a new top level: the head spans the whole list there
+            self.head.width[level] = self.size + 1
+            chain.append(self.head)
+            steps.append(-1)
+        self.level = max(self.level, levels)
+        for level in range(levels):
+            prev = chain[level]
+            node.next[level] = prev.next[level]
+            node.width[level] = steps[level] + prev.width[level] + 1 - index
+            prev.next[level] = node
+            prev.width[level] = index - steps[level]
+        for level in range(levels, self.level):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain, _ = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        for level in range(len(node.next)):
+            prev = chain[level]
+            prev.width[level] += node.width[level] - 1
+            prev.next[level] = node.next[level]
+        for level in range(len(node.next), self.level):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        chain, steps = self._path(key)
+        node = chain[0].next[0]
+        if node is None or node.key != key:
+            raise KeyError(key)
+        return steps[0] + 1
+
+    def slice(self, start: int, count: int) -> list:
+        node, pos = self.head, -1
+        for level in reversed(range(self.level)):
+            while node.next[level] is not None and pos + node.width[level] <= start:
+                pos += node.width[level]
+                node = node.next[level]
+        keys = []
+        if pos != start:   # start is past the end
+            return keys
+        while node is not None and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+class Ranking:
+    """Users of one leaderboard kept sorted by (solves, first bloods), best first.
+
+    Updates and rank lookups are O(log n) on a skip list; a page of top-N
+    costs O(log n + N).
+    """
+
+    def __init__(self):
+        self.stats = {}               # user -> (solves, bloods)
+        self._keys = RankedKeys()     # (-solves, -bloods, user)
+
+    @classmethod
+    def from_stats(cls, stats: dict) -> "Ranking":
+        """Ranking of {user: (solves, bloods)} built with one sort."""
+        ranking = cls()
+        ranking.stats = dict(stats)
+        ranking._keys = RankedKeys.from_sorted(sorted((-s, -b, user) for user, (s, b) in stats.items()))
+        return ranking
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, user: str, blooded: bool):
+        solves, bloods = self.stats.get(user, (0, 0))
+        if solves:
+            self._keys.remove((-solves, -bloods, user))
+        solves, bloods = solves + 1, bloods + int(blooded)
+        self.stats[user] = (solves, bloods)
+        self._keys.insert((-solves, -bloods, user))
+
+    def page(self, start: int, count: int) -> list:
+        """[(rank, user, solves, bloods)] for ranks start+1 .. start+count."""
+        return [
+            (start + i + 1, user, -solves, -bloods)
+            for i, (solves, bloods, user) in enumerate(self._keys.slice(start, count))
+        ]
+
+    def rank(self, user: str):
+        """(rank, solves, bloods) of a user, or None if they have no solves."""
+        if user not in self.stats:
+            return None
+        solves, bloods = self.stats[user]
+        return self._keys.index((-solves, -bloods, user)) + 1, solves, bloods
+
+class LeaderboardIndex:
+    """Overall, per-CTF and per-challenge-category rankings, updated on every solve."""
+
+    def __init__(self):
+        self.rankings = defaultdict(Ranking)
+
+    def clear(self):
+        self.rankings.clear()
+
+    def rebuild(self, solves: list):
+        """Rankings from a full solve log: per-user totals first, then one sort per ranking."""
+        totals = defaultdict(lambda: defaultdict(lambda: [0, 0]))   # scope -> user -> [solves, bloods]
+        for entry in solves:
+            for user in entry["users"]:
+                for scope in self._scopes(entry):
+                    stats = totals[scope][normalize_mention(user)]
+                    stats[0] += 1
+                    stats[1] += int(entry["blooded"])
+        self.clear()
+        for scope, stats in totals.items():
+            self.rankings[scope] = Ranking.from_stats({user: tuple(s) for user, s in stats.items()})
+
+    @staticmethod
+    def _scopes(entry: dict) -> list:
+        scopes = [("all", None), ("type", entry["channel"].split("-")[0].lower())]
+        if entry.get("ctf"):
+            scopes.append(("ctf", entry["ctf"].lower()))
+        return scopes
+
+    def add_solve(self, entry: dict):
+        scopes = self._scopes(entry)
+        for user in entry["users"]:
+            for scope in scopes:
+                self.rankings[scope].add(normalize_mention(user), entry["blooded"])
+
+    def get(self, ctf: str = None, category: str = None):
+        if ctf:
+            scope = ("ctf", ctf.lower())
+        elif category:
+            scope = ("type", category.lower())
+        else:
+            scope = ("all", None)
+        return self.rankings.get(scope)
+
+leaderboards = defaultdict(LeaderboardIndex)   # guild id -> that server's rankings
+
+def rebuild_leaderboards(solves: list):
+    by_guild = defaultdict(list)
+    for entry in solves:
+        by_guild[entry["guild_id"]].append(entry)
+    leaderboards.clear()
+    for guild_id, entries in by_guild.items():
+        leaderboards[guild_id].rebuild(entries)
+
+class LeaderboardView(View):
+    def __init__(self, ranking: Ranking, title: str):
+        super().__init__(timeout=120)
+        self.ranking = ranking
+        self.title = title
+        self.page_index = 0
+        self.pages = max(1, -(-len(ranking) // LEADERBOARD_PAGE_SIZE))
+        self._update_buttons()
+
+    def embed(self) -> discord.Embed:
+        rows = self.ranking.page(self.page_index * LEADERBOARD_PAGE_SIZE, LEADERBOARD_PAGE_SIZE)
+        embed = discord.Embed(
+            title=self.title,
+            description="\n".join(
+                f"{rank}. {user} → 🏆 {solves} solves | 🔥 {bloods} first bloods"
+                for rank, user, solves, bloods in rows
+            ),
+            color=discord.Color.gold()
+        )
+        embed.set_footer(text=f"Page {self.page_index + 1}/{self.pages} • {len(self.ranking)} solvers")
+        return embed
+
+    def _update_buttons(self):
+        self.previous.disabled = self.page_index == 0
+        self.next.disabled = self.page_index >= self.pages - 1
+
+    @button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous(self, interaction: Interaction, button: Button):
+        self.page_index -= 1
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
+    @button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next(self, interaction: Interaction, button: Button):
+        self.page_index += 1
+        self._update_buttons()
+        await interaction.response.edit_message(embed=self.embed(), view=self)
+
 @bot.tree.command(name="leaderboard", description="Show leaderboard of solvers")
-async def leaderboard(interaction: discord.Interaction):
-    if not solved_logs:
+@app_commands.describe(
+    ctf="Only count solves from this CTF (can't be combined with category)",
+    category="Only count solves in this challenge category, e.g. web or crypto (can't be combined with ctf)",
+    user="Show this user's rank instead of the full board"
+)
+async def leaderboard(interaction: discord.Interaction, ctf: str = None, category: str = None, user: discord.Member = None):
+    if ctf and category:
+        await interaction.response.send_message("❌ Pick either a CTF or a category, not both.", ephemeral=True)
+        return
+
+    index = leaderboards.get(interaction.guild_id)
+    ranking = index.get(ctf=ctf, category=category) if index else None
+    if not ranking:
         await interaction.response.send_message("🏆 No solves yet.", ephemeral=True)
         return
 
-    stats = {}
-    for entry in solved_logs:
-        for user in entry["users"]:
-            if user not in stats:
-                stats[user] = {"solves": 0, "bloods": 0}
-            stats[user]["solves"] += 1
-            if entry["blooded"]:
-                stats[user]["bloods"] += 1
+    scope = f" — {ctf}" if ctf else f" — {category.lower()}" if category else ""
+    title = f"🏆 Leaderboard{scope}"
 
-    sorted_stats = sorted(stats.items(), key=lambda x: (x[1]["solves"], x[1]["bloods"]), reverse=True)
+    if user:
+        found = ranking.rank(f"<@{user.id}>")
+        if not found:
+            await interaction.response.send_message(f"🏆 {user.mention} has no solves yet.", ephemeral=True)
+            return
+        rank, solves, bloods = found
+        await interaction.response.send_message(
+            f"{title}\n{rank}. {user.mention} → 🏆 {solves} solves | 🔥 {bloods} first bloods",
+            ephemeral=True
+        )
+        return
 
-    leaderboard_lines = [
-        f"{i+1}. {user} → 🏆 {data['solves']} solves | 🔥 {data['bloods']} first bloods"
-        for i, (user, data) in enumerate(sorted_stats)
-    ]
+    view = LeaderboardView(ranking, title)
+    await interaction.response.send_message(embed=view.embed(), view=view, ephemeral=True)
+
+EXPORT_PAGE_SIZE = 100                # messages per history page / JSONL flush
+EXPORT_CHUNK_SIZE = 64 * 1024         # bytes per attachment read
+EXPORT_SPOOL_SIZE = 1024 * 1024       # JSONL kept in memory up to this size, then spilled to disk
+EXPORT_CONCURRENCY = 4                # channel histories fetched at once, across all exports
+PROGRESS_INTERVAL = 3.0               # minimum seconds between progress message edits
+
+export_slots = asyncio.Semaphore(EXPORT_CONCURRENCY)
+
+class ProgressReporter:
+    """Coalesces progress updates into at most one message edit per interval.
+
+    With no message (e.g. a job resumed at startup) updates are dropped and
+    the final text is logged.
+    """
+
+    def __init__(self, message, interval: float = PROGRESS_INTERVAL):
+        self.message = message
+        self.interval = interval
+        self._text = None
+        self._dirty = False
+        self._task = None
+
+    def update(self, text: str):
+        if self.message is None:
+            return
+        self._text = text
+        self._dirty = True
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while self._dirty:
+            self._dirty = False
+            try:
+                await self.message.edit(content=self._text)
+            except discord.HTTPException:
+                pass
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    async def finish(self, text: str):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.message is None:
+            print(text)
+            return
+        await self.message.edit(content=text)
+
+class ExportStats:
+    def __init__(self, name: str, channels: int):
+        self.name = name
+        self.channels = channels
+        self.channels_done = 0
+        self.messages = 0
+        self.bytes = 0
+        self.skipped = 0
+        self.failed = 0
+        self.started = time.perf_counter()
+
+    def progress(self) -> str:
+        return (
+            f"⏳ Exporting `{self.name}`: {self.channels_done}/{self.channels} channels, "
+            f"{self.messages} messages processed..."
+        )
+
+    def summary(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-6)
+        mb = self.bytes / (1024 * 1024)
+        return (
+            f"✅ Export complete for `{self.name}`: {self.channels} channels, {self.messages} messages, "
+            f"{mb:.1f} MB in {elapsed:.1f}s ({self.messages / elapsed:.0f} msg/s, {mb / elapsed:.2f} MB/s)"
+            + (
+                f"\n⚠️ Attachments skipped: {self.skipped}, failed: {self.failed} (see attachments_report.jsonl)"
+                if self.skipped or self.failed else ""
+            )
+        )
+
+    def add_issues(self, issues: list):
+        for issue in issues:
+            if issue["status"] == "skipped":
+                self.skipped += 1
+            else:
+                self.failed += 1
+
+async def iter_history_pages(channel: discord.TextChannel, after=None, page_size: int = EXPORT_PAGE_SIZE):
+    """Yield a channel's history oldest first, one page of messages at a time."""
+    page = []
+    async for msg in channel.history(limit=None, after=after, oldest_first=True):
+        page.append(msg)
+        if len(page) >= page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+def attachment_path(msg: discord.Message, att: discord.Attachment):
+    """Path of an exported attachment inside its channel folder, or None to skip it."""
+    filename = f"{msg.id}_{att.filename}"
+    if att.content_type and att.content_type.startswith("image"):
+        return f"images/{filename}"
+    if att.filename.endswith(".txt"):
+        return f"txt/{filename}"
+    if att.filename.endswith(".py"):
+        return f"txt/{filename.rsplit('.', 1)[0]}.txt"  # save .py files as .txt
+    return None  # skip other files
+
+def message_record(msg: discord.Message, attachments: list) -> dict:
+    return {
+        "id": msg.id,
+        "author": str(msg.author),
+        "created_at": msg.created_at.isoformat(),
+        "content": msg.content,
+        "attachments": attachments,
+        "embeds": [e.to_dict() for e in msg.embeds],
+    }
+
+EXPORT_DOWNLOAD_BUDGET = 64 * 1024 * 1024       # attachment bytes downloading at once, across all exports
+EXPORT_MAX_ATTACHMENT_SIZE = 50 * 1024 * 1024   # larger attachments are skipped
+
+class ByteBudget:
+    """Semaphore counted in bytes: a download reserves its size before it starts."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.available = capacity
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def reserve(self, size: int):
+        size = min(max(size, 1), self.capacity)
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.available >= size)
+            self.available -= size
+        try:
+            yield
+        finally:
+            async with self._cond:
+                self.available += size
+                self._cond.notify_all()
+
+download_slots = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+download_budget = ByteBudget(EXPORT_DOWNLOAD_BUDGET)
+
+async def download_attachment(att: discord.Attachment, dest):
+    """Stream an attachment into the file object `dest` in fixed-size chunks.
+
+    Returns (sha256, size, None) on success or (None, 0, (status, reason)) where
+    status is "skipped" or "failed". Retries (connection errors, 429/5xx) are
+    left to http_client; a transfer that breaks off midway is reported as failed.
+    """
+    if att.size > EXPORT_MAX_ATTACHMENT_SIZE:
+        return None, 0, ("skipped", f"{att.size} bytes is over the {EXPORT_MAX_ATTACHMENT_SIZE} byte limit")
+
+    async with download_slots, download_budget.reserve(att.size):
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            async with http_client.get(att.url, timeout=DOWNLOAD_TIMEOUT) as resp:
+                if resp.status != 200:
+                    return None, 0, ("failed", f"HTTP {resp.status}")
+                async for chunk in resp.content.iter_chunked(EXPORT_CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > EXPORT_MAX_ATTACHMENT_SIZE:
+                        return None, 0, ("skipped", f"over the {EXPORT_MAX_ATTACHMENT_SIZE} byte limit")
+                    dest.write(chunk)
+                    digest.update(chunk)
+            return digest.hexdigest(), size, None
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return None, 0, ("failed", str(e) or type(e).__name__)
+
+def attachment_issue(msg: discord.Message, att: discord.Attachment, error: tuple) -> dict:
+    status, reason = error
+    return {"message_id": msg.id, "attachment_id": att.id, "file": att.filename, "status": status, "reason": reason}
+
+def report_lines(issues: list) -> bytes:
+    return b"".join((json.dumps(issue, ensure_ascii=False) + "\n").encode("utf-8") for issue in issues)
+
+class ZipExport:
+    """ZIP archive written one entry at a time, straight from the network or a spool file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, "w")
+        self.lock = asyncio.Lock()  # zipfile can only have one entry open for writing
+        self.bytes_written = 0
+
+    def _entry(self, arcname: str, compress: bool) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(arcname, date_time=datetime.now().timetuple()[:6])
+        # text compresses well; images and binaries are usually compressed already
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        return info
+
+    async def add_attachment(self, arcname: str, att: discord.Attachment):
+        """Download an attachment to a spool file, then copy it in. Returns (size, error)."""
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE) as f:
+            _, size, error = await download_attachment(att, f)
+            if not error:
+                await self.add_fileobj(arcname, f, compress=False)
+        return size, error
+
+    async def add_fileobj(self, arcname: str, fileobj, compress: bool = True):
+        async with self.lock:
+            fileobj.seek(0)
+            with self.zip.open(self._entry(arcname, compress=compress), "w", force_zip64=True) as f:
+                while chunk := fileobj.read(EXPORT_CHUNK_SIZE):
+                    f.write(chunk)
+                    self.bytes_written += len(chunk)
+                    await asyncio.sleep(0)  # large local files: let the event loop breathe
+
+    def close(self):
+        self.zip.close()
+
+async def export_channel(ch: discord.TextChannel, archive: ZipExport, stats: ExportStats, progress: ProgressReporter) -> int:
+    """Stream one channel's history into the archive as JSONL plus attachments."""
+    folder = ch.name.replace("/", "_")
+    count = 0
+    issues = []
+    async with export_slots:
+        with tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_SIZE) as records:
+            async for page in iter_history_pages(ch):
+                async def save_files(msg):
+                    files = []
+                    for att in msg.attachments:
+                        path = attachment_path(msg, att)
+                        if not path:
+                            continue
+                        _, error = await archive.add_attachment(f"{folder}/{path}", att)
+                        if error:
+                            issues.append(attachment_issue(msg, att, error))
+                        else:
+                            files.append(path)
+                    return files
+
+                results = await asyncio.gather(*(save_files(msg) for msg in page))
+                for msg, files in zip(page, results):
+                    records.write((json.dumps(message_record(msg, files), ensure_ascii=False) + "\n").encode("utf-8"))
+                count += len(page)
+                stats.messages += len(page)
+                progress.update(stats.progress())
+            await archive.add_fileobj(f"{folder}/{ch.name}.jsonl", records)
+        if issues:
+            await archive.add_fileobj(f"{folder}/attachments_report.jsonl", io.BytesIO(report_lines(issues)))
+            stats.add_issues(issues)
+    stats.channels_done += 1
+    progress.update(stats.progress())
+    return count
+
+EXPORT_DIR = "exports"                               # incremental archives, one folder per category
+EXPORT_BLOB_DIR = os.path.join(EXPORT_DIR, "blobs")  # attachments, stored once by SHA-256
+
+class BlobStore:
+    """Content-addressed attachment store: every file is kept once under its SHA-256.
+
+    Attachments already downloaded (by attachment ID) are never fetched again.
+    """
+
+    def __init__(self, root: str = EXPORT_BLOB_DIR):
+        self.root = root
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    async def fetch(self, att: discord.Attachment, channel_id: int):
+        """Return (sha256, bytes downloaded, error) for an attachment; see download_attachment."""
+        sha256 = await state_store.get_blob(att.id)
+        if sha256 and os.path.exists(self.path(sha256)):
+            return sha256, 0, None
 
-    await interaction.response.send_message("\n".join(leaderboard_lines), ephemeral=True)
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "w+b") as f:
+                sha256, size, error = await download_attachment(att, f)
+            if error:
+                return None, 0, error
+            dest = self.path(sha256)
+            if not os.path.exists(dest):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        state_store.add_blob(att.id, channel_id, sha256, size)
+        return sha256, size, None
+
+    async def put_response(self, resp: aiohttp.ClientResponse):
+        """Stream a response body into the store. Returns (sha256, size)."""
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in resp.content.iter_chunked(EXPORT_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    size += len(chunk)
+            sha256 = digest.hexdigest()
+            dest = self.path(sha256)
+            if not os.path.exists(dest):
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return sha256, size
+
+blob_store = BlobStore()
+
+def archive_path(ch: discord.TextChannel, suffix: str = ".jsonl") -> str:
+    return os.path.join(EXPORT_DIR, str(ch.category_id), f"{ch.id}{suffix}")
+
+def last_record_id(path: str):
+    """ID of the last complete record in a JSONL archive, or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        f.seek(max(0, f.tell() - 64 * 1024))
+        lines = f.read().split(b"\n")
+    for line in reversed(lines):
+        try:
+            return json.loads(line)["id"]
+        except (ValueError, KeyError):
+            continue
+    return None
+
+async def export_channel_incremental(ch: discord.TextChannel, stats: ExportStats, progress: ProgressReporter) -> int:
+    """Append messages newer than the channel's checkpoint to its archive."""
+    path = archive_path(ch)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # the archive file may be a page ahead of the checkpoint if we were interrupted
+    after_ids = [i for i in (await state_store.get_checkpoint(ch.id), last_record_id(path)) if i]
+    after = discord.Object(id=max(after_ids)) if after_ids else None
+
+    count = 0
+    async with export_slots:
+        with open(path, "ab") as records, open(archive_path(ch, ".report.jsonl"), "ab") as report:
+            async for page in iter_history_pages(ch, after=after):
+                issues = []
+
+                async def save_files(msg):
+                    files = []
+                    for att in msg.attachments:
+                        name = attachment_path(msg, att)
+                        if not name:
+                            continue
+                        sha256, size, error = await blob_store.fetch(att, ch.id)
+                        stats.bytes += size
+                        if error:
+                            issues.append(attachment_issue(msg, att, error))
+                        else:
+                            files.append({"path": name, "blob": f"blobs/{sha256}"})
+                    return files
+
+                results = await asyncio.gather(*(save_files(msg) for msg in page))
+                data = b"".join(
+                    (json.dumps(message_record(msg, files), ensure_ascii=False) + "\n").encode("utf-8")
+                    for msg, files in zip(page, results)
+                )
+                records.write(data)
+                records.flush()
+                if issues:
+                    report.write(report_lines(issues))
+                    report.flush()
+                    stats.add_issues(issues)
+                state_store.set_checkpoint(ch.id, page[-1].id)
+
+                count += len(page)
+                stats.messages += len(page)
+                stats.bytes += len(data)
+                progress.update(stats.progress())
+    stats.channels_done += 1
+    progress.update(stats.progress())
+    return count
+
+async def build_archive_zip(channels: list, zip_name: str) -> ZipExport:
+    """ZIP of the channels' local archives, with every referenced blob stored once."""
+    archive = ZipExport(zip_name)
+    try:
+        for ch in channels:
+            folder = ch.name.replace("/", "_")
+            for suffix, arcname in ((".jsonl", f"{folder}/{ch.name}.jsonl"),
+                                    (".report.jsonl", f"{folder}/attachments_report.jsonl")):
+                path = archive_path(ch, suffix)
+                if os.path.exists(path) and os.path.getsize(path):
+                    with open(path, "rb") as f:
+                        await archive.add_fileobj(arcname, f)
+        for sha256 in await state_store.blobs_for_channels([ch.id for ch in channels]):
+            if os.path.exists(blob_store.path(sha256)):
+                with open(blob_store.path(sha256), "rb") as f:
+                    await archive.add_fileobj(f"blobs/{sha256}", f, compress=False)
+    finally:
+        archive.close()
+    return archive
 
 @bot.tree.command(
     name="export",
-    description="Export all messages in the current category to per-channel JSON files and a ZIP"
+    description="Export all messages in the current category to per-channel JSONL files in a ZIP"
 )
-async def export_category(interaction: discord.Interaction):
+@app_commands.describe(mode="full: everything, streamed into the ZIP; incremental: only messages since the last export")
+@app_commands.choices(mode=[
+    app_commands.Choice(name="full", value="full"),
+    app_commands.Choice(name="incremental", value="incremental"),
+])
+async def export_category(interaction: discord.Interaction, mode: str = "full"):
     if not isinstance(interaction.channel, discord.TextChannel) or not interaction.channel.category:
         await interaction.response.send_message(
             "❌ You must use this command inside a text channel inside a category.",
@@ -597,144 +3320,378 @@ async def export_category(interaction: discord.Interaction):
     category = interaction.channel.category
     await interaction.response.defer(thinking=True, ephemeral=True)
 
-    folder_name = f"{category.name}_export"
-    os.makedirs(folder_name, exist_ok=True)
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DOWNLOADS)
-
     # Send initial progress message
     progress_message = await interaction.followup.send(
-        f"⏳ Starting export for category `{category.name}`...",
+        f"⏳ Starting {mode} export for category `{category.name}`...",
         ephemeral=True
     )
 
-    async with aiohttp.ClientSession() as session:
-        for ch in category.channels:
-            if not isinstance(ch, discord.TextChannel):
-                continue
-
-            ch_folder = os.path.join(folder_name, ch.name.replace("/", "_"))
-            os.makedirs(ch_folder, exist_ok=True)
+    channels = category.text_channels
+    stats = ExportStats(category.name, len(channels))
+    progress = ProgressReporter(progress_message)
 
-            # Subfolders for file types
-            folders = {
-                "images": os.path.join(ch_folder, "images"),
-                "txt": os.path.join(ch_folder, "txt"),  # txt includes .txt and renamed .py files
-            }
-            for f in folders.values():
-                os.makedirs(f, exist_ok=True)
-
-            messages = []
-            msgs = [msg async for msg in ch.history(limit=None, oldest_first=True)]
-            total_messages = len(msgs)
-            processed_count = 0
-
-            async def process_message(msg):
-                async def download_attachment(att):
-                    filename = f"{msg.id}_{att.filename}"
-                    dest_folder = None
-
-                    if att.content_type and att.content_type.startswith("image"):
-                        dest_folder = folders["images"]
-                    elif att.filename.endswith(".txt"):
-                        dest_folder = folders["txt"]
-                    elif att.filename.endswith(".py"):
-                        dest_folder = folders["txt"]  # save .py files as .txt
-                        filename = filename.rsplit(".", 1)[0] + ".txt"
-                    else:
-                        return None  # skip other files
-
-                    dest = os.path.join(dest_folder, filename)
-                    try:
-                        async with semaphore:
-                            async with session.get(att.url) as resp:
-                                if resp.status == 200:
-                                    with open(dest, "wb") as f:
-                                        f.write(await resp.read())
-                        return os.path.relpath(dest, ch_folder)
-                    except Exception:
-                        return None
-
-                results = await asyncio.gather(*(download_attachment(att) for att in msg.attachments))
-                local_files = [r for r in results if r]
-
-                return {
-                    "id": msg.id,
-                    "author": str(msg.author),
-                    "content": msg.content,
-                    "attachments": local_files,
-                    "embeds": [e.to_dict() for e in msg.embeds],
-                }
-
-            # process messages concurrently in batches
-            batch_size = 10
-            for i in range(0, len(msgs), batch_size):
-                batch = msgs[i:i+batch_size]
-                processed_batch = await asyncio.gather(*(process_message(m) for m in batch))
-                messages.extend(processed_batch)
-                processed_count += len(batch)
-                # Update progress
-                await progress_message.edit(
-                    content=f"⏳ Exporting channel `{ch.name}`: {processed_count}/{total_messages} messages processed..."
+    zip_name = f"{category.name}.zip"
+    try:
+        if mode == "incremental":
+            results = await asyncio.gather(
+                *(export_channel_incremental(ch, stats, progress) for ch in channels),
+                return_exceptions=True
+            )
+            await build_archive_zip(channels, zip_name)
+        else:
+            archive = ZipExport(zip_name)
+            try:
+                results = await asyncio.gather(
+                    *(export_channel(ch, archive, stats, progress) for ch in channels),
+                    return_exceptions=True
                 )
+            finally:
+                archive.close()
+            stats.bytes = archive.bytes_written
+        failed = [ch.name for ch, result in zip(channels, results) if isinstance(result, Exception)]
+
+        metrics.inc("export_bytes_total", stats.bytes, mode=mode)
+        metrics.inc("export_messages_total", stats.messages, mode=mode)
+
+        # send final ZIP
+        summary = stats.summary()
+        if failed:
+            summary += f"\n⚠️ Could not export: {', '.join(failed)}"
+        await progress.finish(summary)
+        await interaction.followup.send(
+            file=discord.File(zip_name),
+            ephemeral=True
+        )
+    finally:
+        if os.path.exists(zip_name):
+            os.remove(zip_name)
+
+# -------------------- Message search --------------------
+SEARCH_RESULTS = 10                # jump links per /search reply
+SEARCH_SNIPPET_TOKENS = 64         # context shown around the matches (trigram tokens ≈ characters)
+SEARCH_MIN_TERM = 3                # trigram index: shorter terms can't be matched
+SEARCH_BACKFILL_CONCURRENCY = 2    # channel histories backfilled at once, apart from /export's slots
+
+SEARCH_TERM_RE = re.compile(r'"([^"]+)"|(\S+)')
+
+backfill_slots = asyncio.Semaphore(SEARCH_BACKFILL_CONCURRENCY)
+
+def fts_query(text: str):
+    """FTS5 expression matching every term (or "quoted phrase") of `text`, or None if none is long enough."""
+    terms = [phrase or word for phrase, word in SEARCH_TERM_RE.findall(text)]
+    terms = [t for t in terms if len(t) >= SEARCH_MIN_TERM]
+    if not terms:
+        return None
+    return " ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+def is_searchable(channel) -> bool:
+    return isinstance(channel, discord.TextChannel) and is_ctf_category(channel.category)
+
+def index_messages(messages):
+    """Queue messages (content plus attachment names) for the search index."""
+    if not state_store.search_ready:
+        return
+    rows = []
+    for msg in messages:
+        text = "\n".join([msg.content] + [att.filename for att in msg.attachments])
+        if text.strip():
+            rows.append((
+                msg.id, msg.guild.id, msg.channel.category_id, msg.channel.id,
+                msg.author.id, str(msg.author), msg.created_at.timestamp(), text
+            ))
+    if rows:
+        state_store.index_messages(rows)
+        metrics.inc("search_indexed_total", len(rows))
+
+async def index_new_message(message: discord.Message):
+    if is_searchable(message.channel):
+        index_messages([message])
+
+async def index_edited_message(payload: discord.RawMessageUpdateEvent):
+    # the raw event also covers messages that fell out of (or never were in) the message cache
+    if is_searchable(payload.message.channel):
+        index_messages([payload.message])
+
+async def unindex_deleted_message(payload: discord.RawMessageDeleteEvent):
+    state_store.delete_messages([payload.message_id])
+
+async def unindex_deleted_messages(payload: discord.RawBulkMessageDeleteEvent):
+    state_store.delete_messages(list(payload.message_ids))
+
+async def unindex_deleted_channel(channel):
+    if isinstance(channel, discord.TextChannel):
+        state_store.delete_channel_messages(channel.id)
+
+if SEARCH_ENABLED:
+    bot.add_listener(index_new_message, "on_message")
+    bot.add_listener(index_edited_message, "on_raw_message_edit")
+    bot.add_listener(unindex_deleted_message, "on_raw_message_delete")
+    bot.add_listener(unindex_deleted_messages, "on_raw_bulk_message_delete")
+    bot.add_listener(unindex_deleted_channel, "on_guild_channel_delete")
+
+async def backfill_channel(ch: discord.TextChannel, checkpoint) -> int:
+    """Index a channel's history once, resuming after the last page indexed before a restart."""
+    last_id, done = checkpoint or (None, False)
+    if done:
+        return 0
+    indexed = 0
+    async with backfill_slots:
+        async for page in iter_history_pages(ch, after=discord.Object(last_id) if last_id else None):
+            index_messages(page)
+            last_id = page[-1].id
+            state_store.set_search_backfill(ch.id, last_id)
+            indexed += len(page)
+    state_store.set_search_backfill(ch.id, last_id, done=True)
+    return indexed
+
+async def backfill_search_index(guilds) -> str:
+    """Index the history of CTF channels that haven't been backfilled yet; new messages arrive via events."""
+    started = time.perf_counter()
+    checkpoints = await state_store.load_search_backfill()
+    channels = [ch for category in ctf_categories(guilds) for ch in category.text_channels]
+    results = await asyncio.gather(
+        *(backfill_channel(ch, checkpoints.get(ch.id)) for ch in channels),
+        return_exceptions=True
+    )
+    indexed = sum(r for r in results if isinstance(r, int))
+    failed = sum(isinstance(r, Exception) for r in results)
+    return (
+        f"Search index: backfilled {indexed} message(s) from {len(channels)} channel(s) "
+        f"in {time.perf_counter() - started:.1f}s" + (f", {failed} channel(s) failed." if failed else ".")
+    )
 
-            # save channel JSON
-            with open(os.path.join(ch_folder, f"{ch.name}.json"), "w", encoding="utf-8") as f:
-                json.dump(messages, f, indent=4, ensure_ascii=False)
+def parse_day(text: str) -> datetime:
+    return datetime.strptime(text.strip(), "%Y-%m-%d").replace(tzinfo=ZoneInfo("Asia/Kolkata"))
 
-    # zip the folder
-    zip_name = f"{category.name}.zip"
-    with zipfile.ZipFile(zip_name, "w", zipfile.ZIP_DEFLATED) as zipf:
-        for root, _, files in os.walk(folder_name):
-            for file in files:
-                path = os.path.join(root, file)
-                arcname = os.path.relpath(path, folder_name)
-                zipf.write(path, arcname=arcname)
-
-    # send final ZIP
-    await progress_message.edit(
-        content=f"✅ Export complete for `{category.name}`!",
-    )
-    await interaction.followup.send(
-        file=discord.File(zip_name),
-        ephemeral=True
+@bot.tree.command(name="search", description="🔎 Search messages in CTF categories")
+@app_commands.describe(
+    query='Words to find, at least 3 characters each; "quote" exact phrases',
+    category="Only search this category",
+    channel="Only search this channel",
+    author="Only messages from this user",
+    since="Only messages from this day on (YYYY-MM-DD, IST)",
+    until="Only messages up to and including this day (YYYY-MM-DD, IST)"
+)
+async def search(interaction: discord.Interaction, query: str, category: discord.CategoryChannel = None,
+                 channel: discord.TextChannel = None, author: discord.User = None,
+                 since: str = None, until: str = None):
+    if not state_store.search_ready:
+        await interaction.response.send_message("❌ Search is unavailable: this SQLite build can't index messages.", ephemeral=True)
+        return
+    match = fts_query(query)
+    if match is None:
+        await interaction.response.send_message(
+            f"❌ Search terms need at least {SEARCH_MIN_TERM} characters.", ephemeral=True
+        )
+        return
+
+    try:
+        start = parse_day(since).timestamp() if since else None
+        end = (parse_day(until) + timedelta(days=1)).timestamp() if until else None
+    except ValueError:
+        await interaction.response.send_message("❌ Dates must look like `2025-01-31`.", ephemeral=True)
+        return
+
+    if channel:
+        scope = [channel]
+    elif category:
+        scope = category.text_channels
+    else:
+        scope = [ch for c in ctf_categories([interaction.guild]) for ch in c.text_channels]
+    # only channels the caller can read, so private CTF categories stay private
+    channel_ids = [ch.id for ch in scope if ch.permissions_for(interaction.user).read_message_history]
+    if not channel_ids:
+        await interaction.response.send_message("❌ There are no channels you can read to search.", ephemeral=True)
+        return
+
+    started = time.perf_counter()
+    rows = await state_store.search_messages(
+        match, channel_ids, author.id if author else None, start, end, SEARCH_RESULTS, SEARCH_SNIPPET_TOKENS
     )
+    elapsed = time.perf_counter() - started
+    shown = query.replace("`", "'")
+    if not rows:
+        await interaction.response.send_message(f"🔎 No messages match `{shown}`.", ephemeral=True)
+        return
+
+    msg = f"🔎 {len(rows)} result(s) for `{shown}` ({elapsed * 1000:.0f} ms):"
+    for i, r in enumerate(rows, 1):
+        when = datetime.fromtimestamp(r["created_at"], ZoneInfo("Asia/Kolkata")).strftime("%Y-%m-%d %H:%M")
+        url = f"https://discord.com/channels/{r['guild_id']}/{r['channel_id']}/{r['message_id']}"
+        line = f"\n{i}. <#{r['channel_id']}> · {r['author']} · {when} — {' '.join(r['snippet'].split())} [jump]({url})"
+        if len(msg) + len(line) > 2000:
+            break
+        msg += line
+    await interaction.response.send_message(msg, ephemeral=True, suppress_embeds=True)
+
+if not SEARCH_ENABLED:
+    bot.tree.remove_command("search")
+
+# -------------------- Category deletion --------------------
+class CategoryDeletion:
+    """Deletes a category from the channel list snapshotted when it was confirmed.
+
+    The job is saved before anything is deleted and removed once it has
+    finished, so a restart mid-way resumes it (restore_state) instead of
+    leaving a half-deleted category. Deletes run concurrently through the
+    write queue; transient failures are retried, channels already gone count
+    as deleted.
+    """
+
+    def __init__(self, job: dict, progress: ProgressReporter):
+        self.job = job
+        self.progress = progress
+        self.deleted = 0
+        self.failed = []
+
+    @classmethod
+    def for_category(cls, category: discord.CategoryChannel, reason: str, export: bool, progress: ProgressReporter):
+        job = {
+            "category_id": category.id,
+            "guild_id": category.guild.id,
+            "name": category.name,
+            "channel_ids": [ch.id for ch in category.channels],
+            "reason": reason,
+            "export": export,
+            "created_at": time.time(),
+        }
+        state_store.save_delete_job(job)
+        return cls(job, progress)
+
+    async def _delete(self, channel):
+        for attempt in range(HTTP_MAX_RETRIES + 1):
+            try:
+                await channel_writes.delete(channel, reason=self.job["reason"])
+                return
+            except discord.NotFound:
+                return  # already gone
+            except (discord.DiscordServerError, aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= HTTP_MAX_RETRIES:
+                    raise
+                await asyncio.sleep(HTTP_RETRY_BACKOFF * (2 ** attempt))
+
+    async def _delete_channel(self, channel):
+        try:
+            await self._delete(channel)
+        except Exception as e:
+            self.failed.append((channel.name, e))
+        else:
+            self.deleted += 1
+        self.progress.update(
+            f"🗑️ Deleting `{self.job['name']}`: {self.deleted}/{len(self.job['channel_ids'])} channels deleted..."
+        )
+
+    async def _export(self, channels: list) -> str:
+        """Bring the category's incremental archive up to date. Returns an error, or None."""
+        text_channels = [ch for ch in channels if isinstance(ch, discord.TextChannel)]
+        stats = ExportStats(self.job["name"], len(text_channels))
+        results = await asyncio.gather(
+            *(export_channel_incremental(ch, stats, self.progress) for ch in text_channels),
+            return_exceptions=True
+        )
+        failed = [ch.name for ch, result in zip(text_channels, results) if isinstance(result, Exception)]
+        if failed:
+            return f"❌ Could not export {', '.join(failed)}; nothing was deleted."
+        return None
+
+    async def run(self) -> str:
+        category_id = self.job["category_id"]
+        category = bot.get_channel(category_id)
+        channels = [ch for ch in map(bot.get_channel, self.job["channel_ids"]) if ch is not None]
+        missing = len(self.job["channel_ids"]) - len(channels)
+        self.deleted = missing
+
+        if self.job["export"] and channels:
+            error = await self._export(channels)
+            if error:
+                state_store.finish_delete_job(category_id)
+                return error
+
+        await asyncio.gather(*(self._delete_channel(ch) for ch in channels))
+        if self.failed:
+            names = ", ".join(name for name, _ in self.failed)
+            if any(isinstance(e, discord.Forbidden) for _, e in self.failed):
+                reason = "I don't have permission to delete"
+            else:
+                reason = f"Could not delete ({self.failed[0][1]})"
+            state_store.finish_delete_job(category_id)
+            return f"❌ {reason}: {names}. The category `{self.job['name']}` was kept."
+
+        if category is not None:
+            try:
+                await self._delete(category)
+            except discord.Forbidden:
+                state_store.finish_delete_job(category_id)
+                return "❌ I don't have permission to delete the category."
+
+        forget_category(category_id, self.job["channel_ids"])
+        state_store.finish_delete_job(category_id)
+        return f"✅ Category `{self.job['name']}` and all {len(self.job['channel_ids'])} channels deleted."
+
+def forget_category(category_id: int, channel_ids: list):
+    """Drop CTF reminders, the CTFd link, the solve poller, the challenge index and searchable messages of a deleted category."""
+    stop_solve_poller(category_id)
+    challenge_index.forget(category_id)
+    if ctfd_links.pop(category_id, None):
+        state_store.delete_ctfd_link(category_id)
+    for channel_id in channel_ids:
+        state_store.delete_channel_messages(channel_id)
+        ctf = find_ctf(channel_id)
+        if ctf:
+            ctf_events.remove(ctf)
+            state_store.delete_ctf(channel_id)
+            reminder_scheduler.unschedule(channel_id)
+
+delete_jobs = {}   # category id -> running deletion task
+
+def start_category_deletion(deletion: CategoryDeletion) -> asyncio.Task:
+    category_id = deletion.job["category_id"]
+
+    async def run():
+        try:
+            text = await deletion.run()
+        except Exception as e:
+            text = f"❌ Deleting `{deletion.job['name']}` failed: {e}"
+        finally:
+            delete_jobs.pop(category_id, None)
+        try:
+            await deletion.progress.finish(text)
+        except discord.HTTPException:
+            print(text)  # the message went away with the channel it was sent in
+
+    task = delete_jobs[category_id] = asyncio.create_task(run())
+    return task
 
-    # cleanup
-    for root, dirs, files in os.walk(folder_name, topdown=False):
-        for file in files:
-            os.remove(os.path.join(root, file))
-        for d in dirs:
-            os.rmdir(os.path.join(root, d))
-    os.rmdir(folder_name)
-    os.remove(zip_name)
+async def resume_category_deletions():
+    for job in await state_store.load_delete_jobs():
+        if job["category_id"] not in delete_jobs and owns_guild(job["guild_id"]):
+            print(f"Resuming deletion of category {job['name']}")
+            start_category_deletion(CategoryDeletion(job, ProgressReporter(None)))
 
 class ConfirmDeleteView(View):
-    def __init__(self, category):
+    def __init__(self, category, export: bool = False):
         super().__init__(timeout=15)  # 15-second timeout
         self.category = category
+        self.export = export
         self.confirmed = False
 
     @button(label="Yes", style=discord.ButtonStyle.danger)
     async def confirm(self, interaction: Interaction, button: Button):
         self.confirmed = True
         self.stop()  # stops waiting for interaction
+        if self.category.id in delete_jobs:
+            await interaction.response.send_message(
+                f"⏳ Category `{self.category.name}` is already being deleted.", ephemeral=True
+            )
+            return
         await interaction.response.send_message(
-            f"🗑️ Deleting category `{self.category.name}` and its channels…",
+            f"🗑️ Deleting category `{self.category.name}` and its channels…"
+            + (" (exporting first)" if self.export else ""),
             ephemeral=True
         )
-        # delete channels
-        for ch in self.category.channels:
-            try:
-                await ch.delete(reason=f"Deleted by {interaction.user}")
-            except discord.Forbidden:
-                continue
-        # delete category
-        try:
-            await self.category.delete(reason=f"Deleted by {interaction.user}")
-        except discord.Forbidden:
-            await interaction.followup.send("❌ I don't have permission to delete the category.", ephemeral=True)
-            return
-        await interaction.followup.send(f"✅ Category `{self.category.name}` and all channels deleted.", ephemeral=True)
+        progress = ProgressReporter(await interaction.original_response())
+        deletion = CategoryDeletion.for_category(self.category, f"Deleted by {interaction.user}", self.export, progress)
+        await start_category_deletion(deletion)
 
     @button(label="No", style=discord.ButtonStyle.secondary)
     async def cancel(self, interaction: Interaction, button: Button):
@@ -745,7 +3702,8 @@ class ConfirmDeleteView(View):
     name="delete",
     description="Delete the current category and all channels under it"
 )
-async def delete_category(interaction: Interaction):
+@app_commands.describe(export="Update the category's incremental export before deleting anything")
+async def delete_category(interaction: Interaction, export: bool = False):
     if not isinstance(interaction.channel, TextChannel) or not interaction.channel.category:
         await interaction.response.send_message(
             "❌ You must use this command inside a text channel inside a category.",
@@ -762,7 +3720,7 @@ async def delete_category(interaction: Interaction):
 
     category = interaction.channel.category
 
-    view = ConfirmDeleteView(category)
+    view = ConfirmDeleteView(category, export)
     await interaction.response.send_message(
         f"⚠️ Are you sure you want to delete the category `{category.name}` and ALL its channels? This cannot be undone.",
         view=view,
@@ -770,20 +3728,23 @@ async def delete_category(interaction: Interaction):
     )
 
 
-@bot.tree.command(name="reset", description="Clear the solved challenges log and all saved CTFd credentials (Admin only)")
+@bot.tree.command(name="reset", description="Clear this server's solved challenges log and saved CTFd credentials (Admin only)")
 async def reset(interaction: discord.Interaction):
     if not interaction.user.guild_permissions.manage_guild:
         await interaction.response.send_message("❌ You don’t have permission to use this command.", ephemeral=True)
         return
-    solved_logs.clear()
-    user_ctfd_data.clear()
+    await reset_ctfd_clients(interaction.guild_id)
+    state_store.clear_solves(interaction.guild_id)
+    leaderboards.pop(interaction.guild_id, None)
+    state_store.clear_ctfd_sessions(interaction.guild_id)
 
     await interaction.response.send_message(
-        "✅ Solved challenge logs and all saved CTFd credentials have been cleared.",
+        "✅ This server's solved challenge logs and saved CTFd credentials have been cleared.",
         ephemeral=True
     )
 
-bot.run("l")
+if __name__ == "__main__":
+    bot.run(os.environ["DISCORD_TOKEN"])
 #https://discord.com/oauth2/authorize?client_id=1387392910604894259&permissions=397553003568&scope=bot%20applications.commands
 #ctfd_36ea35cd6fe1860d4b222828858c99414c41fe812d75bee9aa1e07001ed84c3b
 
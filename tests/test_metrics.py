@@ -0,0 +1,29 @@
+import os
+import sys
+import types
+
+from yarl import URL
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot  # noqa: E402
+
+def test_interaction_callback_route_hides_token():
+    url = "/api/v10/interactions/1234567890123456789/aW50ZXJhY3Rpb246c2VjcmV0/callback"
+    assert bot.discord_route(url) == "/interactions/{id}/{token}/callback"
+
+def test_webhook_routes_hide_token():
+    assert bot.discord_route("/api/v10/webhooks/1234567890123456789/s3cr3t-T0ken") == "/webhooks/{id}/{token}"
+    assert (
+        bot.discord_route("/api/v10/webhooks/1234567890123456789/s3cr3t/messages/@original")
+        == "/webhooks/{id}/{token}/messages/@original"
+    )
+
+def test_interaction_callbacks_share_one_series():
+    metrics = bot.Metrics()
+    for i in range(50):
+        url = URL(f"https://discord.com/api/v10/interactions/{10 ** 18 + i}/token{i}/callback")
+        metrics._record_request("discord", "POST", url, "204", types.SimpleNamespace(started=0.0))
+    assert len(metrics.counters) == 1
+    assert len(metrics.histograms) == 1
+    assert "token" not in metrics.render().replace("{token}", "")
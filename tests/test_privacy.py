@@ -0,0 +1,52 @@
+import asyncio
+import os
+import sys
+
+import discord
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+
+import bot  # noqa: E402
+from fakes import FakeDiscord, FakeGuild, FakeInteraction  # noqa: E402
+
+def make_category():
+    guild = FakeGuild(FakeDiscord(latency=0))
+    category = guild.add_category("--- TestCTF ---")
+    data = category.add_channel("data")
+    data._perms = {guild.default_role: discord.PermissionOverwrite(send_messages=False)}
+    chat = category.add_channel("chat")
+    return guild, category, data, chat
+
+def run(command, channel):
+    async def go():
+        bot.channel_writes = bot.ChannelWriteQueue()
+        await command.callback(FakeInteraction(channel))
+    asyncio.run(go())
+
+def test_public_keeps_read_only_data_channel():
+    guild, category, data, chat = make_category()
+    run(bot.public, chat)
+    assert data.overwrites == {guild.default_role: discord.PermissionOverwrite(send_messages=False)}
+    assert chat.overwrites == {}
+
+def test_public_only_lifts_view_deny():
+    guild, category, data, chat = make_category()
+    admin = guild.roles[1]
+    data._perms = {
+        guild.default_role: discord.PermissionOverwrite(view_channel=False, send_messages=False),
+        admin: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+    }
+    run(bot.public, chat)
+    assert data.overwrites == {
+        guild.default_role: discord.PermissionOverwrite(send_messages=False),
+        admin: discord.PermissionOverwrite(view_channel=True, send_messages=True),
+    }
+
+def test_private_then_public_restores_visibility():
+    guild, category, data, chat = make_category()
+    run(bot.private, chat)
+    assert all(not c.overwrites[guild.default_role].view_channel for c in (category, data, chat))
+    run(bot.public, chat)
+    assert all(guild.default_role not in c.overwrites for c in (category, data, chat))